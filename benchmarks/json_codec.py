@@ -0,0 +1,67 @@
+"""Benchmark decoding of large hook tool output
+
+Usage: python benchmarks/json_codec.py
+"""
+
+import base64
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from charm import _json  # noqa: E402
+
+
+def _certificate() -> str:
+    body = base64.encodebytes(os.urandom(1500)).decode()
+    return f"-----BEGIN CERTIFICATE-----\n{body}-----END CERTIFICATE-----\n"
+
+
+def _payloads():
+    # relation-get - (databag with certificate bundles)
+    databag = {
+        f"certificate-{index}": "".join(_certificate() for _ in range(20))
+        for index in range(10)
+    }
+    databag["endpoints"] = "10.0.0.1:5432"
+    # config-get (big config map)
+    config = {f"option-{index}": "x" * 200 for index in range(2000)}
+    config["port"] = 5432
+    return {
+        "databag": (json.dumps(databag).encode(), "endpoints"),
+        "config": (json.dumps(config).encode(), "port"),
+    }
+
+
+def _measure(function, number: int):
+    seconds = min(timeit.repeat(function, number=number, repeat=5)) / number
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    decoders = {
+        # Previous behavior (`text=True` then `json.loads()`)
+        "str + json.loads": lambda data, key: json.loads(data.decode())[key],
+        "_json.loads": lambda data, key: _json.loads(data)[key],
+        "_json.loads_lazy (1 key)": lambda data, key: _json.loads_lazy(data)[key],
+        "_json.loads_lazy (keys only)": lambda data, key: len(_json.loads_lazy(data)),
+    }
+    print(f"orjson installed: {_json.orjson is not None}")
+    for name, (data, key) in _payloads().items():
+        print(f"\n{name} ({len(data) / 1024:.0f} KiB)")
+        for decoder_name, decoder in decoders.items():
+            seconds, peak = _measure(lambda: decoder(data, key), number=20)
+            print(
+                f"  {decoder_name:30} {seconds * 1000:8.3f} ms {peak / 1024:10.0f} KiB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,37 @@
+from __future__ import annotations
+
+import importlib as _importlib
 import sys as _sys
 import typing as _typing
 
-from . import _main, _status
-from ._logging import set_up_logging
-from ._main import (
-    ActionEvent,
-    ConfigChangedEvent,
-    Endpoint,
-    Event,
-    InstallEvent,
-    LeaderElectedEvent,
-    LeaderSettingsChangedEvent,
-    PeerRelation,
-    PostSeriesUpgradeEvent,
-    PreSeriesUpgradeEvent,
-    Relation,
-    RelationBrokenEvent,
-    RelationChangedEvent,
-    RelationCreatedEvent,
-    RelationDepartedEvent,
-    RelationEvent,
-    RelationJoinedEvent,
-    RemoveEvent,
-    StartEvent,
-    StopEvent,
-    Unit,
-    UpdateStatusEvent,
-    UpgradeCharmEvent,
-)
-from ._status import (
-    ActiveStatus,
-    BlockedStatus,
-    MaintenanceStatus,
-    Status,
-    WaitingStatus,
-)
+# Imported right away—`_context` starts the hook's time budget (CHARM_HOOK_TIMEOUT)
+# and `set_up_spawner()` should be called before the charm process grows
+from ._context import DeadlineExceeded, HookContext, set_hook_timeout
+from ._spawner import set_up_spawner
+
+if _typing.TYPE_CHECKING:
+    from ._api import *
+
+
+def _import(module: str):
+    return _importlib.import_module(f".{module}", __name__)
+
+
+def __getattr__(name: str):
+    # Other public names are imported when first accessed (see `_api`)
+    if not name.startswith("_"):
+        try:
+            value = getattr(_import("_api"), name)
+        except AttributeError:
+            pass
+        else:
+            globals()[name] = value
+            return value
+    raise AttributeError(f"module {repr(__name__)} has no attribute {repr(name)}")
+
+
+def __dir__():
+    return sorted({*globals(), *dir(_import("_api"))})
 
 
 class _ThisModule(_sys.modules[__name__].__class__):
@@ -45,43 +42,51 @@ class _ThisModule(_sys.modules[__name__].__class__):
 
     @property
     def unit(self):
-        return _main.unit()
+        return _import("_main").unit()
 
     @property
     def app(self):
-        return _main.app()
+        return _import("_main").app()
 
     @property
     def model(self):
-        return _main.model()
+        return _import("_main").model()
 
     @property
     def unit_status(self):
-        return _status.get()
+        return _import("_status").get()
 
     @unit_status.setter
     def unit_status(self, value: Status):
-        _status.set_(value)
+        _import("_status").set_(value)
 
     @property
     def app_status(self):
-        return _status.get(app=True)
+        return _import("_status").get(app=True)
 
     @app_status.setter
     def app_status(self, value: Status):
-        _status.set_(value, app=True)
+        _import("_status").set_(value, app=True)
+
+    @property
+    def opened_ports(self):
+        return _import("_ports").get()
+
+    @opened_ports.setter
+    def opened_ports(self, value: _typing.Iterable[_typing.Union[str, Port]]):
+        _import("_ports").set_(value)
 
     @property
     def is_leader(self):
-        return _main.is_leader()
+        return _import("_main").is_leader()
 
     @property
     def config(self):
-        return _main.Config()
+        return _import("_main").Config()
 
     @property
     def event(self):
-        return _main.event()
+        return _import("_main").event()
 
 
 # TODO: add docstrings
@@ -93,6 +98,8 @@ model: str
 # TODO: document that if you set + get unit status you won't see unit status you set (not the case for app status)
 unit_status: _typing.Optional[Status]
 app_status: _typing.Optional[Status]
+# TODO docstring: setting only opens/closes ports that changed
+opened_ports: _typing.AbstractSet[Port]
 is_leader: bool
 config: _typing.Mapping[str, _typing.Union[str, int, float, bool]]
 event: Event
@@ -0,0 +1,43 @@
+"""Public names of the package
+
+Imported (by `charm/__init__.py`) when one of them is first accessed
+"""
+
+from ._jobs import Job
+from ._logging import set_up_logging
+from ._main import (
+    ActionEvent,
+    ConfigChangedEvent,
+    Endpoint,
+    Event,
+    InstallEvent,
+    LeaderElectedEvent,
+    LeaderSettingsChangedEvent,
+    PebbleReadyEvent,
+    PeerRelation,
+    PostSeriesUpgradeEvent,
+    PreSeriesUpgradeEvent,
+    Relation,
+    RelationBrokenEvent,
+    RelationChangedEvent,
+    RelationCreatedEvent,
+    RelationDepartedEvent,
+    RelationEvent,
+    RelationJoinedEvent,
+    RemoveEvent,
+    StartEvent,
+    StopEvent,
+    Unit,
+    UpdateStatusEvent,
+    UpgradeCharmEvent,
+)
+from ._pebble import Container, Pebble, PebbleError
+from ._ports import Port
+from ._status import (
+    ActiveStatus,
+    BlockedStatus,
+    MaintenanceStatus,
+    Status,
+    WaitingStatus,
+)
+from ._simulator import Simulator
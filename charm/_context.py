@@ -0,0 +1,244 @@
+"""Environment and hook tool transport for the hook that is running
+
+Captured once (instead of read on every access) so that more than one hook can run
+in the same Python process (e.g. with `Simulator`)
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import subprocess
+import threading
+import time
+import types
+import typing
+import weakref
+
+# Seconds (from the start of the hook) that all hook tool calls must finish within
+_TIMEOUT_ENVIRONMENT_VARIABLE = "CHARM_HOOK_TIMEOUT"
+# Start of the hook (this module is imported when the charm imports `charm`)
+_START = time.monotonic()
+
+# Runs hook tool command (with optional stdin & timeout in seconds) and returns stdout
+# Raises `subprocess.CalledProcessError` if the hook tool fails and
+# `subprocess.TimeoutExpired` if the timeout expires
+Transport = typing.Callable[
+    [typing.Sequence[str], typing.Optional[bytes], typing.Optional[float]], bytes
+]
+
+
+def _subprocess_transport(
+    command: typing.Sequence[str],
+    input_: typing.Optional[bytes],
+    timeout: typing.Optional[float],
+) -> bytes:
+    # Process is killed if timeout expires
+    return subprocess.run(
+        command, input=input_, stdout=subprocess.PIPE, check=True, timeout=timeout
+    ).stdout
+
+
+class DeadlineExceeded(TimeoutError):
+    """Hook tool call did not finish before the hook's deadline"""
+
+    def __init__(self, command: typing.Sequence[str], /):
+        super().__init__(f"Hook deadline exceeded while running {repr(command[0])}")
+        self.command = command
+
+
+class _Budget:
+    """Time budget for hook tool calls (changed with `set_hook_timeout()`)
+
+    Separate from `HookContext` so that the deadline can change without replacing the
+    context (and the objects cached for it, e.g. `charm.event`)
+    """
+
+    def __init__(self, deadline: typing.Optional[float], /):
+        # `time.monotonic()` value
+        self.deadline = deadline
+
+
+class HookContext:
+    """Immutable snapshot of the hook's environment variables & hook tool transport"""
+
+    def __init__(
+        self,
+        environ: typing.Mapping[str, str],
+        /,
+        *,
+        transport: Transport = _subprocess_transport,
+        deadline: typing.Optional[float] = None,
+    ):
+        self._environ = types.MappingProxyType(dict(environ))
+        self._budget = _Budget(deadline)
+        self._transport = transport
+
+    def __repr__(self):
+        return f"{type(self).__name__}(hook={repr(self.hook)}, unit={repr(self._environ.get('JUJU_UNIT_NAME'))})"
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "_transport"):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        super().__setattr__(name, value)
+
+    @property
+    def environ(self) -> typing.Mapping[str, str]:
+        return self._environ
+
+    @property
+    def transport(self) -> Transport:
+        return self._transport
+
+    @property
+    def hook(self) -> typing.Optional[str]:
+        # `None` for actions
+        return self._environ.get("JUJU_HOOK_NAME")
+
+    @property
+    def deadline(self) -> typing.Optional[float]:
+        """`time.monotonic()` value that hook tool calls must finish before"""
+        return self._budget.deadline
+
+
+_T = typing.TypeVar("_T")
+
+_default_transport: Transport = _subprocess_transport
+# Context of this process (from `os.environ`)
+_process_context: typing.Optional[HookContext] = None
+# Context bound with `bind()` (per thread & per asyncio task)
+_bound_context: contextvars.ContextVar[typing.Optional[HookContext]] = (
+    contextvars.ContextVar("bound_context", default=None)
+)
+
+
+def set_default_transport(transport: Transport, /) -> None:
+    """Use `transport` for this process's hook context"""
+    global _default_transport, _process_context
+    if (
+        _process_context is not None
+        and _process_context.transport is _default_transport
+    ):
+        _process_context = HookContext(
+            _process_context.environ,
+            transport=transport,
+            deadline=_process_context.deadline,
+        )
+    _default_transport = transport
+
+
+def current() -> HookContext:
+    if (context := _bound_context.get()) is not None:
+        return context
+    global _process_context
+    if _process_context is None:
+        deadline = None
+        if timeout := os.environ.get(_TIMEOUT_ENVIRONMENT_VARIABLE):
+            deadline = _START + float(timeout)
+        _process_context = HookContext(
+            os.environ, transport=_default_transport, deadline=deadline
+        )
+    return _process_context
+
+
+def set_hook_timeout(seconds: typing.Optional[float], /) -> None:
+    """Set deadline for hook tool calls `seconds` from now (`None` for no deadline)
+
+    Overrides CHARM_HOOK_TIMEOUT environment variable. Hook tool calls that do not
+    finish before the deadline are killed and raise `DeadlineExceeded`
+    """
+    current()._budget.deadline = None if seconds is None else time.monotonic() + seconds
+
+
+@contextlib.contextmanager
+def bind(context: HookContext, /):
+    """Use `context` (instead of this process's environment) inside `with` block
+
+    Only affects the current thread (or asyncio task). Use `propagate()` for functions
+    that run in other threads
+    """
+    token = _bound_context.set(context)
+    try:
+        yield context
+    finally:
+        _bound_context.reset(token)
+
+
+def propagate(function: typing.Callable[..., _T], /) -> typing.Callable[..., _T]:
+    """Wrap `function` to use the current hook context in any thread (e.g. thread pool)"""
+    context = current()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with bind(context):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def cache_per_context(
+    function: typing.Callable[[HookContext], _T], /
+) -> typing.Callable[[HookContext], _T]:
+    """Cache result of `function` for each hook context (while the context exists)
+
+    Unlike `functools.lru_cache`, contexts used in different threads (e.g. by
+    `Simulator`) do not evict each other's results, and contexts are not kept alive
+    """
+    cache: "weakref.WeakKeyDictionary[HookContext, _T]" = weakref.WeakKeyDictionary()
+    lock = threading.Lock()
+
+    @functools.wraps(function)
+    def wrapper(context: HookContext, /) -> _T:
+        with lock:
+            try:
+                return cache[context]
+            except KeyError:
+                pass
+            result = cache[context] = function(context)
+            return result
+
+    return wrapper
+
+
+def run(
+    command: typing.Sequence[str],
+    /,
+    *,
+    input_: typing.Optional[bytes] = None,
+    timeout: typing.Optional[float] = None,
+) -> bytes:
+    """Run hook tool and return stdout
+
+    Raises `DeadlineExceeded` (without running the hook tool if the deadline has
+    already passed)
+
+    `timeout` limits the hook tool to fewer seconds than are left until the deadline
+    (e.g. for calls that are not critical). Raises `subprocess.TimeoutExpired` if it
+    expires before the deadline
+    """
+    until_deadline = remaining_time(command)
+    deadline_applies = timeout is None or (
+        until_deadline is not None and until_deadline <= timeout
+    )
+    if deadline_applies:
+        timeout = until_deadline
+    try:
+        return current().transport(command, input_, timeout)
+    except subprocess.TimeoutExpired:
+        if deadline_applies:
+            raise DeadlineExceeded(command)
+        raise
+
+
+def remaining_time(command: typing.Sequence[str], /) -> typing.Optional[float]:
+    """Seconds until deadline (`None` if no deadline)
+
+    Raises `DeadlineExceeded` for `command` if the deadline has already passed
+    """
+    deadline = current().deadline
+    if deadline is None:
+        return None
+    timeout = deadline - time.monotonic()
+    if timeout <= 0:
+        raise DeadlineExceeded(command)
+    return timeout
@@ -0,0 +1,49 @@
+"""Detached worker process for `Job`"""
+
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+from . import _jobs
+
+
+def _work(record_path: pathlib.Path):
+    # Wait until `Job.start()` has written the record
+    sys.stdin.buffer.read()
+    record = json.loads(record_path.read_text())
+    if record["pid"] != os.getpid():
+        # `Job.start()` failed before writing the record
+        return
+    progress_path = record_path.with_suffix(".progress")
+    try:
+        returncode = subprocess.run(
+            record["command"],
+            stdin=subprocess.DEVNULL,
+            env={
+                **os.environ,
+                _jobs._PROGRESS_FILE_ENVIRONMENT_VARIABLE: str(progress_path),
+            },
+        ).returncode
+    except OSError as exception:
+        print(f"Failed to run job command: {repr(exception)}", flush=True)
+        returncode = None
+    record["returncode"] = returncode
+    record["state"] = "succeeded" if returncode == 0 else "failed"
+    record["finished"] = time.time()
+    _jobs._write_atomically(record_path, json.dumps(record))
+    if hook := record["hook"]:
+        # Blocks until Juju runs the hook (i.e. after any hook in progress finishes)
+        subprocess.run(
+            [
+                "juju-exec",
+                record["unit"],
+                f"JUJU_DISPATCH_PATH=hooks/{hook} JUJU_HOOK_NAME={hook} ./dispatch",
+            ]
+        )
+
+
+if __name__ == "__main__":
+    _work(pathlib.Path(sys.argv[1]))
@@ -0,0 +1,207 @@
+"""Detached background jobs that outlive the hook that started them
+
+Juju runs one hook at a time per unit. A job runs a command in a detached worker
+process so that the hook that started it (and later hooks) can exit quickly
+"""
+
+import json
+import logging
+import os
+import pathlib
+import subprocess
+import sys
+import time
+import typing
+
+from . import _context, _main
+from ._status import MaintenanceStatus
+
+logger = logging.getLogger(__name__)
+
+_PROGRESS_FILE_ENVIRONMENT_VARIABLE = "CHARM_JOB_PROGRESS_FILE"
+
+
+def _directory() -> pathlib.Path:
+    # Outside of charm directory so that records are not affected by `upgrade-charm`
+    return (
+        pathlib.Path(_context.current().environ["JUJU_CHARM_DIR"]).parent
+        / "charm-api-jobs"
+    )
+
+
+def _write_atomically(path: pathlib.Path, content: str):
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_text(content)
+    os.replace(temporary_path, path)
+
+
+def _worker_environ() -> typing.Dict[str, str]:
+    """Environment of the hook without variables that are specific to the hook
+
+    The job outlives the hook—hook tools called with the hook's context (e.g.
+    `JUJU_CONTEXT_ID`) would fail
+    """
+    environ = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.startswith("JUJU_") and key != _context._TIMEOUT_ENVIRONMENT_VARIABLE
+    }
+    environ["PYTHONPATH"] = os.pathsep.join(sys.path)
+    return environ
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Job:
+    """Command running in a detached process
+
+    Job state is persisted to disk so that any later hook can check on it
+    """
+
+    def __init__(self, name: str, /):
+        if "/" in name or name.startswith("."):
+            raise ValueError(f"Invalid job name: {repr(name)}")
+        self._name = name
+
+    def __repr__(self):
+        return f"{type(self).__name__}({repr(self._name)})"
+
+    @property
+    def _record_path(self):
+        return _directory() / f"{self._name}.json"
+
+    @property
+    def _progress_path(self):
+        return _directory() / f"{self._name}.progress"
+
+    @property
+    def _record(self) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        try:
+            return json.loads(self._record_path.read_text())
+        except FileNotFoundError:
+            return None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @classmethod
+    def start(
+        cls,
+        name: str,
+        command: typing.Sequence[str],
+        /,
+        *,
+        hook: typing.Optional[str] = None,
+    ) -> "Job":
+        """Run `command` in a detached process and return immediately
+
+        If `hook` is set (e.g. "update-status"), that hook is dispatched (with
+        `juju-exec`) after the command exits
+
+        Output of the command is written to "<name>.log" in the job directory
+
+        The command does not run in the hook's context (`JUJU_*` environment variables
+        are removed)—use `hook` to run charm code after the command exits
+        """
+        job = cls(name)
+        if job.running:
+            raise ValueError(f"{repr(job)} is already running")
+        directory = _directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        job._progress_path.unlink(missing_ok=True)
+        with open(directory / f"{name}.log", "wb") as log_file:
+            worker = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    f"{__package__}._job_worker",
+                    str(job._record_path),
+                ],
+                # Worker waits until stdin is closed (i.e. until the record is written)
+                stdin=subprocess.PIPE,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                env=_worker_environ(),
+                start_new_session=True,
+            )
+        try:
+            _write_atomically(
+                job._record_path,
+                json.dumps(
+                    {
+                        "command": list(command),
+                        "unit": _main.unit(),
+                        "hook": hook,
+                        "state": "running",
+                        "pid": worker.pid,
+                        "returncode": None,
+                        "started": time.time(),
+                        "finished": None,
+                    }
+                ),
+            )
+        finally:
+            worker.stdin.close()
+        logger.debug(f"Started {repr(job)}: {repr(list(command))}")
+        return job
+
+    @property
+    def state(self) -> typing.Optional[str]:
+        """One of "running", "succeeded", "failed", or `None` if never started"""
+        record = self._record
+        if record is None:
+            return None
+        if (
+            record["state"] == "running"
+            and record["pid"] is not None
+            and not _is_running(record["pid"])
+        ):
+            # Worker exited without updating the record (e.g. machine rebooted)
+            return "failed"
+        return record["state"]
+
+    @property
+    def running(self) -> bool:
+        return self.state == "running"
+
+    @property
+    def returncode(self) -> typing.Optional[int]:
+        if record := self._record:
+            return record["returncode"]
+
+    @property
+    def progress(self) -> typing.Optional[str]:
+        """Last message reported by the command with `Job.report_progress()`"""
+        try:
+            return self._progress_path.read_text()
+        except FileNotFoundError:
+            return None
+
+    @property
+    def status(self) -> typing.Optional[MaintenanceStatus]:
+        """Status that describes the job while it is running
+
+        Example: `charm.unit_status = job.status or charm.ActiveStatus()`
+        """
+        if not self.running:
+            return None
+        if progress := self.progress:
+            return MaintenanceStatus(f"{self._name}: {progress}")
+        return MaintenanceStatus(f"{self._name}: running")
+
+    @staticmethod
+    def report_progress(message: str, /):
+        """Call from inside a job's command to report progress to later hooks"""
+        path = os.environ.get(_PROGRESS_FILE_ENVIRONMENT_VARIABLE)
+        if path is None:
+            raise RuntimeError("`Job.report_progress()` called outside of a job")
+        _write_atomically(pathlib.Path(path), message)
@@ -0,0 +1,153 @@
+"""Decodes JSON hook tool output (bytes, without decoding to `str` first)
+
+Uses orjson if it is installed
+"""
+
+import json
+import re
+import typing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _loads = orjson.loads
+else:
+    _loads = json.loads
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+# Number, true, false, or null
+_SCALAR = re.compile(rb"[^,}\]\s]+")
+# String (skipped) or bracket
+_CONTAINER_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+
+
+def loads(data: bytes, /) -> typing.Any:
+    return _loads(data)
+
+
+def _skip_string(data: bytes, index: int, /) -> int:
+    """Returns index after JSON string that starts at `index`"""
+    # `bytes.find()` is much faster than a regular expression for long strings with
+    # many escape sequences (e.g. certificates)
+    end = index
+    while True:
+        end = data.find(b'"', end + 1)
+        if end == -1:
+            raise json.JSONDecodeError(
+                "Unterminated string", data.decode(errors="replace"), index
+            )
+        # Quote is escaped if preceded by odd number of backslashes
+        backslashes = 0
+        while data[end - 1 - backslashes] == 0x5C:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+
+
+def _skip_value(data: bytes, index: int, /) -> int:
+    """Returns index after JSON value that starts at `index`"""
+    first = data[index : index + 1]
+    if first == b'"':
+        return _skip_string(data, index)
+    elif first in (b"{", b"["):
+        depth = 0
+        for match in _CONTAINER_TOKEN.finditer(data, index):
+            token = match.group()
+            if token in (b"{", b"["):
+                depth += 1
+            elif token in (b"}", b"]"):
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        match = None
+    else:
+        match = _SCALAR.match(data, index)
+    if match is None:
+        raise json.JSONDecodeError(
+            "Invalid value", data.decode(errors="replace"), index
+        )
+    return match.end()
+
+
+class _LazyObject(typing.Mapping[str, typing.Any]):
+    """Read-only mapping for JSON object that only decodes values that are accessed
+
+    Keys are decoded (and the object is checked for valid structure) immediately
+    """
+
+    def __init__(self, data: bytes, /):
+        self._data = data
+        # Key: (start, end) of value in `data`
+        self._spans: typing.Dict[str, typing.Tuple[int, int]] = {}
+        self._values: typing.Dict[str, typing.Any] = {}
+
+        def error(message, index):
+            return json.JSONDecodeError(message, data.decode(errors="replace"), index)
+
+        def skip_whitespace(index):
+            return _WHITESPACE.match(data, index).end()
+
+        index = skip_whitespace(0)
+        if data[index : index + 1] != b"{":
+            raise error("Expecting JSON object", index)
+        index = skip_whitespace(index + 1)
+        if data[index : index + 1] == b"}":
+            index += 1
+        else:
+            while True:
+                if data[index : index + 1] != b'"':
+                    raise error("Expecting property name", index)
+                end = _skip_string(data, index)
+                key = data[index + 1 : end - 1]
+                if b"\\" in key:
+                    key = json.loads(data[index:end])
+                else:
+                    key = key.decode()
+                index = skip_whitespace(end)
+                if data[index : index + 1] != b":":
+                    raise error("Expecting ':' delimiter", index)
+                start = skip_whitespace(index + 1)
+                end = _skip_value(data, start)
+                self._spans[key] = (start, end)
+                index = skip_whitespace(end)
+                separator = data[index : index + 1]
+                index = skip_whitespace(index + 1)
+                if separator == b"}":
+                    break
+                if separator != b",":
+                    raise error("Expecting ',' delimiter", index)
+        if skip_whitespace(index) != len(data):
+            raise error("Extra data", index)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(keys={repr(list(self._spans))})"
+
+    def __getitem__(self, key: str):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        start, end = self._spans[key]
+        value = self._values[key] = _loads(self._data[start:end])
+        return value
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __contains__(self, key):
+        return key in self._spans
+
+
+def loads_lazy(data: bytes, /) -> typing.Mapping[str, typing.Any]:
+    """Decode JSON object (values are only decoded when accessed)
+
+    Faster than `loads()` for objects with a few large values. Slower for objects
+    with many small values (see benchmarks/json_codec.py)
+    """
+    return _LazyObject(data)
@@ -1,16 +1,36 @@
 import logging
-import os
 import subprocess
 import sys
 
+from . import _context
+
+# Seconds—logging is not critical and should not use up the hook's deadline
+_TIMEOUT = 5
+
 
 class _Handler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self._juju_log_timed_out = False
+
     def emit(self, record):
         try:
             message = self.format(record)
-            subprocess.run(
-                ["juju-log", "--log-level", record.levelname, message], check=True
-            )
+            if not self._juju_log_timed_out:
+                try:
+                    _context.run(
+                        ["juju-log", "--log-level", record.levelname, message],
+                        timeout=_TIMEOUT,
+                    )
+                    return
+                except subprocess.TimeoutExpired:
+                    # Do not wait for `juju-log` again
+                    self._juju_log_timed_out = True
+                except _context.DeadlineExceeded:
+                    pass
+            # Fall back to stderr (captured by Juju in the unit's debug log) instead of
+            # failing the hook
+            print(f"{record.levelname}: {message}", file=sys.stderr)
         except Exception:
             self.handleError(record)
 
@@ -30,7 +50,7 @@ def set_up_logging() -> None:
             "Uncaught exception in charm code", exc_info=(type_, value, traceback)
         )
 
-        if os.environ.get("JUJU_ACTION_NAME"):
+        if _context.current().environ.get("JUJU_ACTION_NAME"):
             # Print to stderr (so that exception is displayed in output of `juju run`)
             sys.__excepthook__(type_, value, traceback)
 
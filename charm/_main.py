@@ -1,11 +1,14 @@
 import collections.abc
+import concurrent.futures
+import functools
+import hashlib
 import json
 import logging
-import os
-import subprocess
 import types
 import typing
 
+from . import _context, _json, _pebble
+
 logger = logging.getLogger(__name__)
 
 
@@ -95,40 +98,41 @@ class _Databag(typing.Mapping[str, str]):
             command.append("--app")
         return command
 
+    def _load(self) -> typing.Mapping[str, str]:
+        """Get entire databag contents with one hook tool call
+
+        Values are only decoded when accessed (databags can contain large values,
+        e.g. certificates)
+        """
+        return _json.loads_lazy(_context.run(self._command_get(key="-")))
+
     def __getitem__(self, key: str) -> str:
-        result = json.loads(
-            subprocess.run(
-                self._command_get(key=key), capture_output=True, check=True, text=True
-            ).stdout
-        )
+        result = _json.loads(_context.run(self._command_get(key=key)))
         if result is None:
             raise KeyError(key)
         return result
 
     def __iter__(self):
-        result: typing.Dict[str, str] = json.loads(
-            subprocess.run(
-                self._command_get(key="-"), capture_output=True, check=True, text=True
-            ).stdout
-        )
-        return iter(result.keys())
+        return iter(self._load().keys())
 
     def __len__(self):
-        result: typing.Dict[str, str] = json.loads(
-            subprocess.run(
-                self._command_get(key="-"), capture_output=True, check=True, text=True
-            ).stdout
-        )
-        return len(result)
+        return len(self._load())
 
 
 class _WriteableDatabag(_Databag, typing.MutableMapping[str, str]):
-    def __setitem__(self, key: str, value: typing.Optional[str]):
+    def _update(self, data: typing.Mapping[str, typing.Optional[str]], /):
+        """Set multiple keys with one hook tool call
+
+        Keys with value `None` are deleted
+        """
         command = ["relation-set", "--relation", str(self._relation_id), "--file", "-"]
         if "/" not in self._unit_or_app:
             # `self._unit_or_app` is app
             command.append("--app")
-        subprocess.run(command, input=json.dumps({key: value}), check=True, text=True)
+        _context.run(command, input_=json.dumps(dict(data)).encode())
+
+    def __setitem__(self, key: str, value: typing.Optional[str]):
+        self._update({key: value})
         logger.debug(f"Set {repr(self)}[{repr(key)}] = {repr(value)}")
 
     def __delitem__(self, key):
@@ -141,12 +145,14 @@ class _RelationSubset(typing.Mapping[str, typing.Mapping[str, str]]):
     def __init__(self, *, relation: "Relation", keys: typing.List[str]):
         self._relation = relation
         self._keys = keys
+        # `str` so that `Unit` and `str` keys compare (and hash) the same
+        self._key_set = {str(key) for key in keys}
 
     def __repr__(self):
         return f"{type(self).__name__}(relation={repr(self._relation)}, keys={repr(self._keys)})"
 
     def __getitem__(self, key):
-        if key not in self._keys:
+        if str(key) not in self._key_set:
             raise KeyError(key)
         return self._relation[key]
 
@@ -162,21 +168,18 @@ class Relation(typing.Mapping[str, typing.Mapping[str, str]]):
     def _other_units(self):
         return [
             Unit(unit_name)
-            for unit_name in json.loads(
-                subprocess.run(
-                    ["relation-list", "--format", "json", "--relation", str(self.id)],
-                    capture_output=True,
-                    check=True,
-                    text=True,
-                ).stdout
+            for unit_name in _json.loads(
+                _context.run(
+                    ["relation-list", "--format", "json", "--relation", str(self.id)]
+                )
             )
         ]
 
     @property
     def _other_app(self) -> str:
         # TODO: make public and rename to other_app_name?
-        return json.loads(
-            subprocess.run(
+        return _json.loads(
+            _context.run(
                 [
                     "relation-list",
                     "--format",
@@ -184,11 +187,8 @@ class Relation(typing.Mapping[str, typing.Mapping[str, str]]):
                     "--relation",
                     str(self.id),
                     "--app",
-                ],
-                capture_output=True,
-                check=True,
-                text=True,
-            ).stdout
+                ]
+            )
         )
 
     @property
@@ -208,6 +208,9 @@ class Relation(typing.Mapping[str, typing.Mapping[str, str]]):
     def __eq__(self, other):
         return isinstance(other, Relation) and self.id == other.id
 
+    def __hash__(self):
+        return hash(self.id)
+
     def __repr__(self):
         return f"{type(self).__name__}({self.id})"
 
@@ -253,6 +256,31 @@ class Relation(typing.Mapping[str, typing.Mapping[str, str]]):
         return self[self._other_app]
 
 
+_T = typing.TypeVar("_T")
+
+_DesiredDatabag = typing.Union[
+    typing.Mapping[str, typing.Optional[str]],
+    typing.Callable[[Relation], typing.Mapping[str, typing.Optional[str]]],
+]
+
+# Set automatically by Juju in every unit databag
+_JUJU_UNIT_DATABAG_KEYS = ("egress-subnets", "ingress-address", "private-address")
+
+
+class _DatabagDiff(typing.NamedTuple):
+    relation: Relation
+    unit_or_app: str
+    # Added or changed keys (new values)
+    changed: typing.Mapping[str, str]
+    deleted: typing.FrozenSet[str]
+
+
+class _Reconciliation(typing.NamedTuple):
+    # Only databags that were written to
+    diffs: typing.List[_DatabagDiff]
+    failures: typing.Dict[Relation, Exception]
+
+
 class Endpoint(typing.Collection[Relation]):
     # Convenience for subclasses
     _Relation: typing.Type[Relation] = Relation
@@ -260,13 +288,8 @@ class Endpoint(typing.Collection[Relation]):
     @property
     def _relations(self):
         # Example: ["database:5", "database:6"]
-        result: list[str] = json.loads(
-            subprocess.run(
-                ["relation-ids", "--format", "json", self._name],
-                capture_output=True,
-                check=True,
-                text=True,
-            ).stdout
+        result: list[str] = _json.loads(
+            _context.run(["relation-ids", "--format", "json", self._name])
         )
         ids = (int(id_.removeprefix(f"{self._name}:")) for id_ in result)
         return [self._Relation(id_) for id_ in ids]
@@ -299,6 +322,288 @@ class Endpoint(typing.Collection[Relation]):
         for relation in self:
             return relation
 
+    def broadcast(
+        self,
+        data: typing.Union[
+            typing.Mapping[str, typing.Optional[str]],
+            typing.Callable[[Relation], typing.Mapping[str, typing.Optional[str]]],
+        ],
+        /,
+        *,
+        app: bool = False,
+        max_workers: int = 8,
+    ) -> typing.Dict[Relation, Exception]:
+        """Write to this unit's (or app's) databag in every relation on this endpoint
+
+        `data` is a mapping (written to every relation) or a callable that is given a
+        `Relation` and returns a mapping. Keys with value `None` are deleted. Keys not in
+        `data` are left unchanged.
+
+        Relations are written to concurrently (at most `max_workers` at a time).
+        Relations where the databag already contains `data` are skipped.
+
+        Returns relations that failed to be written to (and their exception). A failure on
+        one relation does not stop writes to other relations.
+        """
+        if app and not is_leader():
+            raise ValueError(
+                f"Unable to broadcast to app databags on {repr(self)}. Only the leader unit can write to app databags"
+            )
+        unit_or_app = unit().app if app else unit()
+
+        def write(relation: Relation):
+            new = data(relation) if callable(data) else data
+            databag = _WriteableDatabag(
+                relation_id=relation.id, unit_or_app=unit_or_app
+            )
+            old = databag._load()
+            if all(old.get(key) == value for key, value in new.items()):
+                return
+            databag._update(new)
+            logger.debug(f"Updated {repr(databag)} with {repr(dict(new))}")
+
+        _, failures = self._for_each_relation(write, max_workers=max_workers)
+        return failures
+
+    def reconcile(
+        self,
+        *,
+        my_unit: typing.Optional[_DesiredDatabag] = None,
+        my_app: typing.Optional[_DesiredDatabag] = None,
+        max_workers: int = 8,
+    ) -> _Reconciliation:
+        """Make this unit's and/or app's databag in every relation on this endpoint match desired contents
+
+        `my_unit` and `my_app` are mappings (same contents for every relation) or
+        callables that are given a `Relation` and return a mapping. `None` leaves that
+        databag untouched.
+
+        Keys in the databag that are not desired (or are desired with value `None`) are
+        deleted (except for keys that Juju sets in unit databags, e.g.
+        "ingress-address"). Only changed and deleted keys
+        are written—with at most one hook tool call per databag. Unchanged databags are
+        not written to (so that remote units do not get an unnecessary
+        relation-changed event).
+
+        Relations are reconciled concurrently (at most `max_workers` at a time). A
+        failure on one relation does not stop other relations from being reconciled.
+        """
+        if my_app is not None and not is_leader():
+            raise ValueError(
+                f"Unable to reconcile app databags on {repr(self)}. Only the leader unit can write to app databags"
+            )
+        this_unit = unit()
+        targets = [
+            (unit_or_app, desired)
+            for unit_or_app, desired in ((this_unit, my_unit), (this_unit.app, my_app))
+            if desired is not None
+        ]
+
+        def reconcile_relation(relation: Relation) -> typing.List[_DatabagDiff]:
+            diffs = []
+            for unit_or_app, desired in targets:
+                if callable(desired):
+                    desired = desired(relation)
+                databag = _WriteableDatabag(
+                    relation_id=relation.id, unit_or_app=unit_or_app
+                )
+                current = databag._load()
+                changed = {
+                    key: value
+                    for key, value in desired.items()
+                    if value is not None and current.get(key) != value
+                }
+                ignored = _JUJU_UNIT_DATABAG_KEYS if unit_or_app == this_unit else ()
+                deleted = frozenset(
+                    key
+                    for key in current
+                    if desired.get(key) is None and key not in ignored
+                )
+                if not changed and not deleted:
+                    continue
+                databag._update({**changed, **dict.fromkeys(deleted)})
+                diff = _DatabagDiff(
+                    relation=relation,
+                    unit_or_app=unit_or_app,
+                    changed=types.MappingProxyType(changed),
+                    deleted=deleted,
+                )
+                logger.debug(f"Reconciled {repr(databag)}: {repr(diff)}")
+                diffs.append(diff)
+            return diffs
+
+        results, failures = self._for_each_relation(
+            reconcile_relation, max_workers=max_workers
+        )
+        return _Reconciliation(
+            diffs=[diff for diffs in results.values() for diff in diffs],
+            failures=failures,
+        )
+
+    def _for_each_relation(
+        self, function: typing.Callable[[Relation], _T], /, *, max_workers: int
+    ) -> typing.Tuple[typing.Dict[Relation, _T], typing.Dict[Relation, Exception]]:
+        """Call `function` on every relation concurrently
+
+        Returns results and exceptions (a failure on one relation does not stop the
+        others)
+        """
+        results: typing.Dict[Relation, _T] = {}
+        failures: typing.Dict[Relation, Exception] = {}
+        function = _context.propagate(function)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(function, relation): relation for relation in self
+            }
+            for future in concurrent.futures.as_completed(futures):
+                relation = futures[future]
+                if exception := future.exception():
+                    logger.warning(
+                        f"Failed to write to {repr(relation)} on {repr(self)}: {repr(exception)}"
+                    )
+                    failures[relation] = exception
+                else:
+                    results[relation] = future.result()
+        return results, failures
+
+
+class _PeerColumn(typing.Mapping[Unit, typing.Optional[str]]):
+    """Read-only values of one key in a `_PeerTable` for every unit"""
+
+    def __init__(
+        self,
+        *,
+        units: typing.Tuple[Unit, ...],
+        index: typing.Mapping[str, int],
+        values: typing.Tuple[typing.Optional[str], ...],
+    ):
+        self._units = units
+        self._index = index
+        self._values = values
+
+    def __repr__(self):
+        return f"{type(self).__name__}({repr(dict(zip(self._units, self._values)))})"
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._index[str(key)]]
+        except KeyError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._units)
+
+    def __len__(self):
+        return len(self._units)
+
+
+class _PeerTable(typing.Mapping[Unit, typing.Mapping[str, typing.Optional[str]]]):
+    """Read-only columnar snapshot of selected databag keys for every unit in a peer relation
+
+    Missing keys have value `None`
+    """
+
+    def __init__(
+        self,
+        *,
+        units: typing.Sequence[Unit],
+        columns: typing.Mapping[str, typing.Sequence[typing.Optional[str]]],
+    ):
+        self._units = tuple(units)
+        # `str` so that `Unit` and `str` keys compare (and hash) the same
+        self._index = {str(unit_): row for row, unit_ in enumerate(self._units)}
+        self._columns = {key: tuple(column) for key, column in columns.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}(units={repr(self._units)}, keys={repr(list(self._columns))})"
+
+    def __getitem__(self, key):
+        try:
+            row = self._index[str(key)]
+        except KeyError:
+            raise KeyError(key)
+        return types.MappingProxyType(
+            {key_: column[row] for key_, column in self._columns.items()}
+        )
+
+    def __iter__(self):
+        return iter(self._units)
+
+    def __len__(self):
+        return len(self._units)
+
+    def column(self, key: str, /) -> typing.Mapping[Unit, typing.Optional[str]]:
+        return _PeerColumn(
+            units=self._units, index=self._index, values=self._columns[key]
+        )
+
+    def where(
+        self,
+        key: str,
+        value: typing.Union[str, None, typing.Callable[[typing.Optional[str]], bool]],
+        /,
+    ) -> typing.List[Unit]:
+        """Units where `key` has `value` (or where `value(<key's value>)` is true)"""
+        column = self._columns[key]
+        if callable(value):
+            return [
+                unit_ for unit_, value_ in zip(self._units, column) if value(value_)
+            ]
+        return [unit_ for unit_, value_ in zip(self._units, column) if value_ == value]
+
+    def group_by(
+        self, key: str, /
+    ) -> typing.Dict[typing.Optional[str], typing.List[Unit]]:
+        groups: typing.Dict[typing.Optional[str], typing.List[Unit]] = {}
+        for unit_, value in zip(self._units, self._columns[key]):
+            groups.setdefault(value, []).append(unit_)
+        return groups
+
+    def _extreme(self, function, key: str, type_: typing.Callable[[str], typing.Any]):
+        rows = [
+            (type_(value), unit_)
+            for unit_, value in zip(self._units, self._columns[key])
+            if value is not None
+        ]
+        if not rows:
+            return None
+        _, unit_ = function(rows, key=lambda row: row[0])
+        return unit_
+
+    def max(
+        self, key: str, /, *, type_: typing.Callable[[str], typing.Any]
+    ) -> typing.Optional[Unit]:
+        """Unit with highest value for `key` (after conversion with `type_`)
+
+        `type_` is required since databag values are strings (e.g. `type_=int` so that
+        "100" is higher than "9"). Units without `key` are ignored. Returns `None` if no
+        unit has `key`
+        """
+        return self._extreme(max, key, type_)
+
+    def min(
+        self, key: str, /, *, type_: typing.Callable[[str], typing.Any]
+    ) -> typing.Optional[Unit]:
+        """Unit with lowest value for `key` (after conversion with `type_`)
+
+        `type_` is required since databag values are strings (e.g. `type_=int` so that
+        "100" is higher than "9"). Units without `key` are ignored. Returns `None` if no
+        unit has `key`
+        """
+        return self._extreme(min, key, type_)
+
+
+_Item = typing.TypeVar("_Item", str, int)
+
+
+def _shard_score(
+    unit_: Unit, item: typing.Union[str, int], /
+) -> typing.Tuple[int, int]:
+    # Stable across processes (unlike `hash()`)
+    digest = hashlib.blake2b(f"{unit_}\0{item}".encode(), digest_size=8).digest()
+    # Unit number breaks ties
+    return int.from_bytes(digest, "big"), unit_.number
+
 
 class PeerRelation(Relation):
     @classmethod
@@ -314,6 +619,64 @@ class PeerRelation(Relation):
     def all_units(self) -> typing.Mapping[Unit, typing.Mapping[str, str]]:
         return _RelationSubset(relation=self, keys=[unit(), *self._other_units])
 
+    def table(self, *, keys: typing.Iterable[str], max_workers: int = 8) -> _PeerTable:
+        """Load `keys` from every unit's databag into a columnar snapshot
+
+        Each unit's databag is read with one hook tool call. Databags are read
+        concurrently (at most `max_workers` at a time)
+        """
+        keys = list(keys)
+        units = [unit(), *self._other_units]
+
+        def load(unit_: Unit):
+            return _Databag(relation_id=self.id, unit_or_app=unit_)._load()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            databags = list(executor.map(_context.propagate(load), units))
+        return _PeerTable(
+            units=units,
+            columns={key: [databag.get(key) for databag in databags] for key in keys},
+        )
+
+    def shard(
+        self, items: typing.Iterable[_Item], /, *, key: str = "shard"
+    ) -> typing.List[_Item]:
+        """Items (e.g. relation ids or client names) that this unit owns
+
+        Items are assigned to units in this relation with rendezvous (consistent)
+        hashing—every unit computes the same assignment without coordination. When a
+        unit joins or leaves, only the items that it gains or loses are reassigned.
+
+        Ownership is recorded in this unit's databag at `key` (JSON list) so that other
+        units can see it with `shard_owners()`
+        """
+        units = sorted([unit(), *self._other_units])
+        this_unit = unit()
+        owned = [
+            item
+            for item in items
+            if max(units, key=lambda unit_: _shard_score(unit_, item)) == this_unit
+        ]
+        value = json.dumps(sorted(str(item) for item in owned))
+        databag = _WriteableDatabag(relation_id=self.id, unit_or_app=this_unit)
+        if databag._load().get(key) != value:
+            databag[key] = value
+        return owned
+
+    def shard_owners(
+        self, *, key: str = "shard"
+    ) -> typing.Dict[str, typing.List[Unit]]:
+        """Units that have recorded ownership of each item (with `shard()`)
+
+        During membership changes, an item can briefly have more than one owner (or
+        none) until every unit has called `shard()`
+        """
+        owners: typing.Dict[str, typing.List[Unit]] = {}
+        for unit_, value in self.table(keys=[key]).column(key).items():
+            for item in json.loads(value) if value is not None else []:
+                owners.setdefault(item, []).append(unit_)
+        return owners
+
 
 # Do not expose this class publicly (i.e. in top-level __init__.py)
 class Config(typing.Mapping[str, typing.Union[str, int, float, bool]]):
@@ -322,42 +685,25 @@ class Config(typing.Mapping[str, typing.Union[str, int, float, bool]]):
         return f"{type(self).__name__}()"
 
     def __getitem__(self, key: str):
-        result = json.loads(
-            subprocess.run(
-                ["config-get", "--format", "json", key],
-                capture_output=True,
-                check=True,
-                text=True,
-            ).stdout
-        )
+        result = _json.loads(_context.run(["config-get", "--format", "json", key]))
         if result is None:
             raise KeyError(key)
         return result
 
     def __iter__(self):
-        result: typing.Dict[str, typing.Union[str, int, float, bool]] = json.loads(
-            subprocess.run(
-                ["config-get", "--format", "json"],
-                capture_output=True,
-                check=True,
-                text=True,
-            ).stdout
+        result: typing.Dict[str, typing.Union[str, int, float, bool]] = _json.loads(
+            _context.run(["config-get", "--format", "json"])
         )
         return iter(result.keys())
 
     def __len__(self):
-        result: typing.Dict[str, typing.Union[str, int, float, bool]] = json.loads(
-            subprocess.run(
-                ["config-get", "--format", "json"],
-                capture_output=True,
-                check=True,
-                text=True,
-            ).stdout
+        result: typing.Dict[str, typing.Union[str, int, float, bool]] = _json.loads(
+            _context.run(["config-get", "--format", "json"])
         )
         return len(result)
 
 
-# TODO: add pebble, secret, and storage events
+# TODO: add other pebble events, secret, and storage events
 class Event:
     def __repr__(self):
         return f"{type(self).__name__}()"
@@ -413,24 +759,17 @@ _ActionResult = typing.Mapping[str, typing.Union[str, "_ActionResult"]]
 class ActionEvent(Event):
     @property
     def action(self) -> str:
-        return os.environ["JUJU_ACTION_NAME"]
+        return _context.current().environ["JUJU_ACTION_NAME"]
 
     @property
     def parameters(self) -> collections.abc.Mapping:
         return types.MappingProxyType(
-            json.loads(
-                subprocess.run(
-                    ["action-get", "--format", "json"],
-                    capture_output=True,
-                    check=True,
-                    text=True,
-                ).stdout
-            )
+            _json.loads(_context.run(["action-get", "--format", "json"]))
         )
 
     @staticmethod
     def log(message: str, /):
-        subprocess.run(["action-log", message], check=True)
+        _context.run(["action-log", message])
 
     @classmethod
     def _flatten(
@@ -466,7 +805,7 @@ class ActionEvent(Event):
         command = ["action-set"]
         for key, value_ in self._flatten(value).items():
             command.append(f"{key}={value_}")
-        subprocess.run(command, check=True)
+        _context.run(command)
         logger.debug(f"Set {repr(self)}.result = {repr(value)}")
 
     result = property(fset=_set_result)
@@ -475,24 +814,25 @@ class ActionEvent(Event):
         command = ["action-fail"]
         if message is not None:
             command.append(message)
-        subprocess.run(command, check=True)
+        _context.run(command)
         logger.debug(
             f'Called {repr(self)}.fail({repr(message) if message is not None else ""})'
         )
 
 
 class RelationEvent(Event):
-    @property
+    @functools.cached_property
     def relation(self) -> Relation:
+        environ = _context.current().environ
         # Example: "database:5"
-        id_ = os.environ["JUJU_RELATION_ID"]
+        id_ = environ["JUJU_RELATION_ID"]
         # Example: 5
-        id_ = int(id_.removeprefix(f'{os.environ["JUJU_RELATION"]}:'))
+        id_ = int(id_.removeprefix(f'{environ["JUJU_RELATION"]}:'))
         return Relation(id_)
 
-    @property
+    @functools.cached_property
     def endpoint(self) -> Endpoint:
-        return Endpoint(os.environ["JUJU_RELATION"])
+        return Endpoint(_context.current().environ["JUJU_RELATION"])
 
 
 class RelationBrokenEvent(RelationEvent):
@@ -504,9 +844,9 @@ class RelationCreatedEvent(RelationEvent):
 
 
 class _RelationUnitEvent(RelationEvent):
-    @property
+    @functools.cached_property
     def remote_unit(self) -> Unit:
-        return Unit(os.environ["JUJU_REMOTE_UNIT"])
+        return Unit(_context.current().environ["JUJU_REMOTE_UNIT"])
 
 
 class RelationChangedEvent(_RelationUnitEvent):
@@ -514,24 +854,36 @@ class RelationChangedEvent(_RelationUnitEvent):
 
 
 class RelationDepartedEvent(_RelationUnitEvent):
-    @property
+    @functools.cached_property
     def departing_unit(self) -> Unit:
-        return Unit(os.environ["JUJU_DEPARTING_UNIT"])
+        return Unit(_context.current().environ["JUJU_DEPARTING_UNIT"])
 
 
 class RelationJoinedEvent(_RelationUnitEvent):
     pass
 
 
+class PebbleReadyEvent(Event):
+    @functools.cached_property
+    def container(self) -> _pebble.Container:
+        return _pebble.Container(_context.current().environ["JUJU_WORKLOAD_NAME"])
+
+
 class _UnknownEvent(Event):
     """Temporary placeholder while not all Juju events are implemented
 
-    (e.g. pebble, secret, and storage events)
+    (e.g. other pebble events, secret, and storage events)
     """
 
 
+# Cached per hook context so that repeated access does not create new objects
+@_context.cache_per_context
+def _unit(context: _context.HookContext, /) -> Unit:
+    return Unit(context.environ["JUJU_UNIT_NAME"])
+
+
 def unit():
-    return Unit(os.environ["JUJU_UNIT_NAME"])
+    return _unit(_context.current())
 
 
 def app():
@@ -539,24 +891,18 @@ def app():
 
 
 def model():
-    return os.environ["JUJU_MODEL_NAME"]
+    return _context.current().environ["JUJU_MODEL_NAME"]
 
 
 def is_leader() -> bool:
-    return json.loads(
-        subprocess.run(
-            ["is-leader", "--format", "json"],
-            capture_output=True,
-            check=True,
-            text=True,
-        ).stdout
-    )
+    return _json.loads(_context.run(["is-leader", "--format", "json"]))
 
 
-def event() -> Event:
-    if os.environ.get("JUJU_ACTION_NAME"):
+@_context.cache_per_context
+def _event(context: _context.HookContext, /) -> Event:
+    if context.environ.get("JUJU_ACTION_NAME"):
         return ActionEvent()
-    name = os.environ["JUJU_HOOK_NAME"]
+    name = context.environ["JUJU_HOOK_NAME"]
     try:
         return _STATICALLY_NAMED_EVENT_TYPES[name]()
     except KeyError:
@@ -564,10 +910,14 @@ def event() -> Event:
     for suffix, type_ in _DYNAMICALLY_NAMED_EVENT_TYPES.items():
         if name.endswith(suffix):
             return type_()
-    # TODO: add pebble, secret, and storage events
+    # TODO: add other pebble events, secret, and storage events
     return _UnknownEvent()
 
 
+def event() -> Event:
+    return _event(_context.current())
+
+
 _STATICALLY_NAMED_EVENT_TYPES: typing.Dict[str, typing.Type[Event]] = {
     "config-changed": ConfigChangedEvent,
     "install": InstallEvent,
@@ -587,4 +937,5 @@ _DYNAMICALLY_NAMED_EVENT_TYPES: typing.Dict[str, typing.Type[Event]] = {
     "-relation-created": RelationCreatedEvent,
     "-relation-departed": RelationDepartedEvent,
     "-relation-joined": RelationJoinedEvent,
+    "-pebble-ready": PebbleReadyEvent,
 }
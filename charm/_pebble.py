@@ -0,0 +1,457 @@
+"""Client for Pebble (workload container service manager) API
+
+One persistent HTTP connection (over the container's unix socket) per container is
+reused for the whole hook
+"""
+
+import contextlib
+import http.client
+import json
+import logging
+import secrets
+import socket
+import threading
+import typing
+import urllib.parse
+import weakref
+
+from . import _context, _json
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class PebbleError(Exception):
+    def __init__(
+        self, message: str, /, *, code: int, kind: typing.Optional[str] = None
+    ):
+        super().__init__(message)
+        self.code = code
+        self.kind = kind
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, /):
+        super().__init__("localhost")
+        self._socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class _Batch:
+    def __init__(self):
+        # (label, layer, combine) in the order they were queued
+        self.layers: typing.List[typing.Tuple[str, dict, bool]] = []
+        # (action, service names) in the order they were queued
+        self.service_actions: typing.List[typing.Tuple[str, typing.List[str]]] = []
+
+    def queue_service_action(self, action: str, services: typing.Iterable[str], /):
+        """Merge with previous action if it is the same action"""
+        if self.service_actions and self.service_actions[-1][0] == action:
+            _, queued = self.service_actions[-1]
+        else:
+            queued = []
+            self.service_actions.append((action, queued))
+        queued.extend(service for service in services if service not in queued)
+
+
+class Pebble:
+    """Pebble API client
+
+    Use `batch()` to send layer and service changes in as few requests as possible
+    """
+
+    def __init__(self, socket_path: str, /):
+        self._socket_path = socket_path
+        self._connection: typing.Optional[_UnixHTTPConnection] = None
+        # One request at a time per connection
+        self._lock = threading.Lock()
+        # Description of request in progress (for `DeadlineExceeded`)
+        self._operation: typing.Optional[str] = None
+        self._batch: typing.Optional[_Batch] = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({repr(self._socket_path)})"
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _set_timeout(self):
+        """Set socket timeout to the time left until the hook's deadline
+
+        Called before every chunk that is sent or read—so that a request with many
+        chunks cannot run past the deadline
+        """
+        timeout = _context.remaining_time([self._operation])
+        self._connection.timeout = timeout
+        if self._connection.sock is not None:
+            self._connection.sock.settimeout(timeout)
+
+    def _with_timeout(self, body: typing.Iterable[bytes], /) -> typing.Iterator[bytes]:
+        for chunk in body:
+            self._set_timeout()
+            yield chunk
+
+    def _read(self, response: http.client.HTTPResponse, /) -> bytes:
+        """Read up to `_CHUNK_SIZE` bytes (empty if response was read completely)"""
+        self._set_timeout()
+        # `read1()` waits for data from the socket at most once
+        if chunk := response.read1(_CHUNK_SIZE):
+            return chunk
+        # `read1()` does not mark response as closed (so that connection can be reused)
+        response.read()
+        return b""
+
+    def _read_all(self, response: http.client.HTTPResponse, /) -> bytes:
+        chunks = []
+        while chunk := self._read(response):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        body: typing.Union[bytes, typing.Iterable[bytes], None],
+        headers: typing.Mapping[str, str],
+    ) -> http.client.HTTPResponse:
+        reused = self._connection is not None
+        if self._connection is None:
+            self._connection = _UnixHTTPConnection(self._socket_path)
+        self._set_timeout()
+        streamed = body is not None and not isinstance(body, bytes)
+        # Connection may have been closed by Pebble while idle. Only retry if Pebble
+        # cannot have received the request (or the request is idempotent)—otherwise
+        # a layer could be added or a service restarted twice
+        written = False
+        try:
+            self._connection.request(
+                method,
+                path,
+                body=self._with_timeout(body) if streamed else body,
+                headers=headers,
+                encode_chunked=streamed,
+            )
+            written = True
+            self._set_timeout()
+            return self._connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            self.close()
+            # Request bodies that are streamed cannot be sent again
+            if reused and not streamed and (not written or method == "GET"):
+                return self._send(method, path, body=body, headers=headers)
+            raise
+
+    @contextlib.contextmanager
+    def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        query: typing.Optional[typing.Mapping[str, str]] = None,
+        body: typing.Union[bytes, typing.Iterable[bytes], None] = None,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+    ) -> typing.Iterator[http.client.HTTPResponse]:
+        """Response must be read with `_read()` (or connection closed) before next request
+
+        Raises `DeadlineExceeded` if the hook's deadline passes while sending the request
+        or reading the response
+        """
+        if query:
+            path = f"{path}?{urllib.parse.urlencode(query)}"
+        with self._lock:
+            self._operation = f"pebble {method} {path}"
+            try:
+                response = self._send(method, path, body=body, headers=headers or {})
+                try:
+                    yield response
+                finally:
+                    # Connection can only be reused if response was read completely
+                    if not response.isclosed() or response.will_close:
+                        self.close()
+            except _context.DeadlineExceeded:
+                self.close()
+                raise
+            except socket.timeout:
+                # Socket timeout is only set if there is a deadline
+                self.close()
+                raise _context.DeadlineExceeded([self._operation]) from None
+            finally:
+                self._operation = None
+
+    @staticmethod
+    def _check(response: http.client.HTTPResponse, content: bytes, /) -> dict:
+        result = _json.loads(content)
+        if result.get("type") == "error" or response.status >= 400:
+            error = result.get("result") or {}
+            raise PebbleError(
+                error.get("message", response.reason),
+                code=response.status,
+                kind=error.get("kind"),
+            )
+        return result
+
+    def _json_request(
+        self,
+        method: str,
+        path: str,
+        *,
+        query: typing.Optional[typing.Mapping[str, str]] = None,
+        body: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+    ) -> dict:
+        headers = {"Accept": "application/json"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        with self._request(
+            method,
+            path,
+            query=query,
+            body=None if body is None else json.dumps(body).encode(),
+            headers=headers,
+        ) as response:
+            return self._check(response, self._read_all(response))
+
+    def _wait_change(self, change_id: str, /):
+        result = self._json_request("GET", f"/v1/changes/{change_id}/wait")["result"]
+        if error := result.get("err"):
+            raise PebbleError(error, code=200, kind="change-error")
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue layer and service changes inside `with` block
+
+        Changes are sent on exit. Layers are added first, in the order they were
+        added—Pebble merges layers with the same label (e.g. `override: merge`). Then
+        service actions (start, stop, restart, replan) are sent in the order they were
+        called—consecutive calls with the same action are merged into one request.
+        Nothing is sent if the `with` block raises an exception
+        """
+        if self._batch is not None:
+            # Nested batch
+            yield
+            return
+        self._batch = _Batch()
+        try:
+            yield
+        except BaseException:
+            self._batch = None
+            raise
+        batch, self._batch = self._batch, None
+        for label, layer, combine in batch.layers:
+            self._add_layer(label, layer, combine=combine)
+        for action, services in batch.service_actions:
+            self._service_action(action, services)
+
+    def _add_layer(self, label: str, layer: typing.Mapping, /, *, combine: bool):
+        self._json_request(
+            "POST",
+            "/v1/layers",
+            body={
+                "action": "add",
+                "label": label,
+                "combine": combine,
+                "format": "yaml",
+                # JSON is valid YAML
+                "layer": json.dumps(layer),
+            },
+        )
+        logger.debug(f"Added layer {repr(label)} with {repr(self)}")
+
+    def add_layer(self, label: str, layer: typing.Mapping, /, *, combine: bool = True):
+        if self._batch is None:
+            self._add_layer(label, layer, combine=combine)
+            return
+        self._batch.layers.append((label, dict(layer), combine))
+
+    def _service_action(self, action: str, services: typing.Sequence[str], /):
+        result = self._json_request(
+            "POST", "/v1/services", body={"action": action, "services": list(services)}
+        )
+        self._wait_change(result["change"])
+        logger.debug(
+            f"Ran {action} for services {repr(list(services))} with {repr(self)}"
+        )
+
+    def _queue_or_run(self, action: str, services: typing.Iterable[str], /):
+        services = list(services)
+        if self._batch is None:
+            self._service_action(action, services)
+        else:
+            self._batch.queue_service_action(action, services)
+
+    def start_services(self, services: typing.Iterable[str], /):
+        self._queue_or_run("start", services)
+
+    def stop_services(self, services: typing.Iterable[str], /):
+        self._queue_or_run("stop", services)
+
+    def restart_services(self, services: typing.Iterable[str], /):
+        self._queue_or_run("restart", services)
+
+    def replan(self):
+        self._queue_or_run("replan", [])
+
+    def get_services(
+        self, names: typing.Optional[typing.Iterable[str]] = None, /
+    ) -> typing.List[dict]:
+        query = None
+        if names is not None:
+            query = {"names": ",".join(names)}
+        return self._json_request("GET", "/v1/services", query=query)["result"]
+
+    def push(
+        self,
+        path: str,
+        source: typing.Union[bytes, str, typing.BinaryIO],
+        /,
+        *,
+        make_dirs: bool = False,
+        permissions: typing.Optional[int] = None,
+    ):
+        """Write `source` to `path` in the container
+
+        File objects are streamed in chunks (instead of read into memory)
+        """
+        file = {"path": path, "make-dirs": make_dirs}
+        if permissions is not None:
+            file["permissions"] = f"{permissions:03o}"
+        boundary = secrets.token_hex(16)
+
+        def body():
+            yield (
+                f"--{boundary}\r\n"
+                "Content-Type: application/json\r\n"
+                'Content-Disposition: form-data; name="request"\r\n\r\n'
+                f'{json.dumps({"action": "write", "files": [file]})}\r\n'
+                f"--{boundary}\r\n"
+                "Content-Type: application/octet-stream\r\n"
+                f'Content-Disposition: form-data; name="files"; filename={json.dumps(path)}\r\n\r\n'
+            ).encode()
+            if isinstance(source, str):
+                yield source.encode()
+            elif isinstance(source, bytes):
+                yield source
+            else:
+                while chunk := source.read(_CHUNK_SIZE):
+                    yield chunk
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        with self._request(
+            "POST",
+            "/v1/files",
+            body=body(),
+            headers={
+                "Accept": "application/json",
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+            },
+        ) as response:
+            result = self._check(response, self._read_all(response))
+        for file_result in result["result"]:
+            if error := file_result.get("error"):
+                raise PebbleError(
+                    error["message"], code=error.get("code", 0), kind=error.get("kind")
+                )
+        logger.debug(f"Pushed {repr(path)} with {repr(self)}")
+
+    def pull(self, path: str, destination: typing.BinaryIO, /):
+        """Write contents of `path` in the container to `destination`
+
+        Contents are streamed in chunks (instead of read into memory)
+        """
+        with self._request(
+            "GET",
+            "/v1/files",
+            query={"action": "read", "path": path},
+            headers={"Accept": "multipart/form-data"},
+        ) as response:
+            if response.headers.get_content_type() != "multipart/form-data":
+                self._check(response, self._read_all(response))
+                raise PebbleError(
+                    f"Unexpected response to pull {repr(path)}", code=response.status
+                )
+            boundary = response.headers.get_param("boundary").encode()
+            self._read_multipart_file(response, boundary, destination)
+
+    def _read_multipart_file(
+        self,
+        response: http.client.HTTPResponse,
+        boundary: bytes,
+        destination: typing.BinaryIO,
+        /,
+    ):
+        """Stream "files" part to `destination` and check "response" part for errors"""
+
+        def read(buffer: bytes) -> bytes:
+            chunk = self._read(response)
+            if not chunk:
+                raise PebbleError("Unexpected end of multipart response", code=200)
+            return buffer + chunk
+
+        buffer = b""
+        while b"\r\n\r\n" not in buffer:
+            buffer = read(buffer)
+        part_headers, buffer = buffer.split(b"\r\n\r\n", maxsplit=1)
+        delimiter = b"\r\n--" + boundary
+        if b'name="files"' in part_headers:
+            while (index := buffer.find(delimiter)) == -1:
+                # Keep end of buffer in case it contains start of delimiter
+                keep = len(delimiter) - 1
+                if len(buffer) > keep:
+                    destination.write(buffer[:-keep])
+                    buffer = buffer[-keep:]
+                buffer = read(buffer)
+            destination.write(buffer[:index])
+            buffer = buffer[index + len(delimiter) :]
+            buffer += self._read_all(response)
+            _, buffer = buffer.split(b"\r\n\r\n", maxsplit=1)
+        else:
+            buffer += self._read_all(response)
+        # "response" part
+        content, _ = buffer.split(delimiter, maxsplit=1)
+        result = self._check(response, content)
+        for file_result in result["result"]:
+            if error := file_result.get("error"):
+                raise PebbleError(
+                    error["message"], code=error.get("code", 0), kind=error.get("kind")
+                )
+
+
+# Per hook context so that clients are not shared by hooks that run in the same
+# process (e.g. with `Simulator`)
+_clients: typing.MutableMapping[_context.HookContext, typing.Dict[str, Pebble]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class Container:
+    def __init__(self, name: str, /):
+        self._name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Container) and self._name == other._name
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({repr(self._name)})"
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def pebble(self) -> Pebble:
+        """Pebble client (connection is reused for the rest of the hook)"""
+        socket_path = f"/charm/containers/{self._name}/pebble.socket"
+        clients = _clients.setdefault(_context.current(), {})
+        if socket_path not in clients:
+            clients[socket_path] = Pebble(socket_path)
+        return clients[socket_path]
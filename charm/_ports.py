@@ -0,0 +1,87 @@
+import logging
+import typing
+
+from . import _context, _json
+
+logger = logging.getLogger(__name__)
+
+
+class Port(str):
+    """Port, port range, or ICMP in hook tool format
+
+    Examples: "80/tcp", "8000-8100/udp", "icmp"
+    """
+
+    def __new__(cls, value: str, /):
+        value = str(value).lower()
+        if value != "icmp":
+            try:
+                range_, protocol = value.split("/")
+                from_port, _, to_port = range_.partition("-")
+                from_port = int(from_port)
+                to_port = int(to_port) if to_port else from_port
+            except ValueError:
+                raise ValueError(
+                    f'Invalid port: {repr(value)}. Expected format "<port>/<protocol>", "<from port>-<to port>/<protocol>", or "icmp"'
+                )
+            if protocol not in ("tcp", "udp"):
+                raise ValueError(
+                    f"Invalid protocol {repr(protocol)} in port {repr(value)}"
+                )
+            if not 1 <= from_port <= to_port <= 65535:
+                raise ValueError(
+                    f"Invalid port: {repr(value)}. Port numbers must be between 1 and 65535 (and the start of a range must not be greater than its end)"
+                )
+            if from_port == to_port:
+                value = f"{from_port}/{protocol}"
+            else:
+                value = f"{from_port}-{to_port}/{protocol}"
+        return super().__new__(cls, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({repr(str(self))})"
+
+    @property
+    def protocol(self) -> str:
+        if self == "icmp":
+            return "icmp"
+        _, protocol = self.split("/")
+        return protocol
+
+    @property
+    def from_port(self) -> typing.Optional[int]:
+        if self == "icmp":
+            return None
+        range_, _ = self.split("/")
+        return int(range_.partition("-")[0])
+
+    @property
+    def to_port(self) -> typing.Optional[int]:
+        if self == "icmp":
+            return None
+        range_, _ = self.split("/")
+        from_port, _, to_port = range_.partition("-")
+        return int(to_port or from_port)
+
+
+def get() -> typing.FrozenSet[Port]:
+    return frozenset(
+        Port(port)
+        for port in _json.loads(_context.run(["opened-ports", "--format", "json"]))
+    )
+
+
+def set_(value: typing.Iterable[typing.Union[str, Port]], /):
+    """Open and close ports so that only `value` is opened
+
+    Only ports that differ from the currently opened ports are opened or closed
+    """
+    desired = frozenset(Port(port) for port in value)
+    current = get()
+    # Close first—Juju rejects opening a range that conflicts with an opened range
+    for port in sorted(current - desired):
+        _context.run(["close-port", port])
+        logger.debug(f"Closed port {repr(port)}")
+    for port in sorted(desired - current):
+        _context.run(["open-port", port])
+        logger.debug(f"Opened port {repr(port)}")
@@ -0,0 +1,307 @@
+"""In-memory Juju model for running many hooks in one Python process"""
+
+import json
+import subprocess
+import typing
+
+from . import _context
+
+_T = typing.TypeVar("_T")
+
+# Hook tool options that take a value
+_OPTIONS = ("--format", "--relation", "-r", "--file", "--log-level")
+
+
+def _parse(
+    arguments: typing.Sequence[str],
+) -> typing.Tuple[typing.Dict[str, str], typing.Set[str], typing.List[str]]:
+    """Split hook tool arguments into options, flags, and positional arguments"""
+    options = {}
+    flags = set()
+    positional = []
+    iterator = iter(arguments)
+    for argument in iterator:
+        if argument in _OPTIONS:
+            options[argument] = next(iterator)
+        elif argument.startswith("--"):
+            flags.add(argument)
+        else:
+            positional.append(argument)
+    return options, flags, positional
+
+
+class _SimulatedRelation:
+    def __init__(
+        self, *, endpoint: str, remote_app: str, remote_units: typing.Iterable[str]
+    ):
+        self.endpoint = endpoint
+        self.remote_app = remote_app
+        self.remote_units = list(remote_units)
+        self.databags: typing.Dict[str, typing.Dict[str, str]] = {}
+
+
+class Simulator:
+    """Runs hooks against an in-memory model instead of Juju hook tools
+
+    Model state (e.g. `leader`, `config`, databags) can be changed between hooks
+
+    Example:
+        simulator = Simulator(unit="postgresql/0", leader=True)
+        relation_id = simulator.add_relation(
+            "database", remote_app="client", remote_units=["client/0"]
+        )
+        simulator.run(
+            "database-relation-changed",
+            main,
+            relation_id=relation_id,
+            remote_unit="client/0",
+        )
+        assert simulator.databag(relation_id, "postgresql")["endpoints"] == ...
+    """
+
+    def __init__(
+        self,
+        *,
+        unit: str,
+        leader: bool = False,
+        config: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+        model: str = "model",
+    ):
+        self.unit = unit
+        self.leader = leader
+        self.config: typing.Dict[str, typing.Any] = dict(config or {})
+        self.model = model
+        # (status, message)
+        self.unit_status: typing.Tuple[str, str] = ("unknown", "")
+        self.app_status: typing.Tuple[str, str] = ("unknown", "")
+        # (level, message)
+        self.logs: typing.List[typing.Tuple[str, str]] = []
+        self.action_logs: typing.List[str] = []
+        self.action_results: typing.Dict[str, str] = {}
+        self.action_failure: typing.Optional[str] = None
+        self.opened_ports: typing.Set[str] = set()
+        self._action_parameters: typing.Dict[str, typing.Any] = {}
+        self._relations: typing.Dict[int, _SimulatedRelation] = {}
+        self._next_relation_id = 0
+
+    def __repr__(self):
+        return f"{type(self).__name__}(unit={repr(self.unit)})"
+
+    @property
+    def app(self) -> str:
+        app_, _ = self.unit.split("/")
+        return app_
+
+    def add_relation(
+        self,
+        endpoint: str,
+        /,
+        *,
+        remote_app: typing.Optional[str] = None,
+        remote_units: typing.Iterable[str] = (),
+    ) -> int:
+        """Add relation and return its id
+
+        For a peer relation, omit `remote_app` (and pass the other units of this app as
+        `remote_units`)
+        """
+        id_ = self._next_relation_id
+        self._next_relation_id += 1
+        self._relations[id_] = _SimulatedRelation(
+            endpoint=endpoint,
+            remote_app=remote_app or self.app,
+            remote_units=remote_units,
+        )
+        return id_
+
+    def remove_relation(self, id_: int, /):
+        del self._relations[id_]
+
+    def remote_units(self, relation_id: int, /) -> typing.List[str]:
+        """Mutable list of remote units in relation"""
+        return self._relations[relation_id].remote_units
+
+    def databag(self, relation_id: int, unit_or_app: str, /) -> typing.Dict[str, str]:
+        """Mutable databag contents"""
+        return self._relations[relation_id].databags.setdefault(unit_or_app, {})
+
+    def _environ(self, hook: typing.Optional[str]) -> typing.Dict[str, str]:
+        environ = {
+            "JUJU_UNIT_NAME": self.unit,
+            "JUJU_MODEL_NAME": self.model,
+            "JUJU_CHARM_DIR": f"/var/lib/juju/agents/unit-{self.unit.replace('/', '-')}/charm",
+        }
+        if hook is not None:
+            environ["JUJU_HOOK_NAME"] = hook
+            environ["JUJU_DISPATCH_PATH"] = f"hooks/{hook}"
+        return environ
+
+    def run(
+        self,
+        hook: str,
+        handler: typing.Callable[[], _T],
+        /,
+        *,
+        relation_id: typing.Optional[int] = None,
+        remote_unit: typing.Optional[str] = None,
+        departing_unit: typing.Optional[str] = None,
+    ) -> _T:
+        """Run `handler` as if Juju was running `hook`"""
+        environ = self._environ(hook)
+        if relation_id is not None:
+            endpoint = self._relations[relation_id].endpoint
+            environ["JUJU_RELATION"] = endpoint
+            environ["JUJU_RELATION_ID"] = f"{endpoint}:{relation_id}"
+            environ["JUJU_REMOTE_APP"] = self._relations[relation_id].remote_app
+        if remote_unit is not None:
+            environ["JUJU_REMOTE_UNIT"] = remote_unit
+        if departing_unit is not None:
+            environ["JUJU_DEPARTING_UNIT"] = departing_unit
+        context = _context.HookContext(environ, transport=self._transport)
+        with _context.bind(context):
+            return handler()
+
+    def run_action(
+        self,
+        action: str,
+        handler: typing.Callable[[], _T],
+        /,
+        *,
+        parameters: typing.Optional[typing.Mapping[str, typing.Any]] = None,
+    ) -> _T:
+        """Run `handler` as if Juju was running `action`
+
+        Resets `action_logs`, `action_results`, and `action_failure`
+        """
+        self.action_logs = []
+        self.action_results = {}
+        self.action_failure = None
+        self._action_parameters = dict(parameters or {})
+        environ = self._environ(None)
+        environ["JUJU_ACTION_NAME"] = action
+        context = _context.HookContext(environ, transport=self._transport)
+        with _context.bind(context):
+            return handler()
+
+    def _transport(
+        self,
+        command: typing.Sequence[str],
+        input_: typing.Optional[bytes],
+        timeout: typing.Optional[float],
+    ) -> bytes:
+        # Like `subprocess`, convert `str` subclasses (e.g. `Unit`) to `str`
+        name, *arguments = (str(argument) for argument in command)
+        try:
+            method = getattr(self, f"_{name.replace('-', '_')}")
+        except AttributeError:
+            raise NotImplementedError(f"Hook tool not simulated: {repr(name)}")
+        options, flags, positional = _parse(arguments)
+        try:
+            result = method(
+                options=options, flags=flags, positional=positional, input_=input_
+            )
+        except (KeyError, ValueError) as exception:
+            raise subprocess.CalledProcessError(
+                1, command, stderr=str(exception).encode()
+            )
+        # Hook tools that do not have output ignore `--format json`
+        return json.dumps(result).encode()
+
+    def _relation(self, options) -> _SimulatedRelation:
+        return self._relations[int(options.get("--relation", options.get("-r")))]
+
+    def _relation_get(self, *, options, flags, positional, input_):
+        key, unit_or_app = positional
+        databag = self._relation(options).databags.get(unit_or_app, {})
+        if key == "-":
+            return databag
+        return databag.get(key)
+
+    def _relation_set(self, *, options, flags, positional, input_):
+        if "--app" in flags:
+            if not self.leader:
+                raise ValueError("cannot write relation settings")
+            unit_or_app = self.app
+        else:
+            unit_or_app = self.unit
+        databag = self._relation(options).databags.setdefault(unit_or_app, {})
+        for key, value in json.loads(input_).items():
+            if value is None:
+                databag.pop(key, None)
+            else:
+                databag[key] = value
+
+    def _relation_list(self, *, options, flags, positional, input_):
+        relation = self._relation(options)
+        if "--app" in flags:
+            return relation.remote_app
+        return relation.remote_units
+
+    def _relation_ids(self, *, options, flags, positional, input_):
+        (endpoint,) = positional
+        return [
+            f"{endpoint}:{id_}"
+            for id_, relation in self._relations.items()
+            if relation.endpoint == endpoint
+        ]
+
+    def _is_leader(self, *, options, flags, positional, input_):
+        return self.leader
+
+    def _config_get(self, *, options, flags, positional, input_):
+        if positional:
+            (key,) = positional
+            return self.config.get(key)
+        return self.config
+
+    def _status_get(self, *, options, flags, positional, input_):
+        if "--application" in flags:
+            status, message = self.app_status
+            return {
+                "application-status": {
+                    "status": status,
+                    "message": message,
+                    "status-data": {},
+                }
+            }
+        status, message = self.unit_status
+        return {"status": status, "message": message, "status-data": {}}
+
+    def _status_set(self, *, options, flags, positional, input_):
+        status, message = positional
+        if "--application" in flags:
+            if not self.leader:
+                raise ValueError("this unit is not the leader")
+            self.app_status = (status, message)
+        else:
+            self.unit_status = (status, message)
+
+    def _juju_log(self, *, options, flags, positional, input_):
+        (message,) = positional
+        self.logs.append((options.get("--log-level", "INFO"), message))
+
+    def _opened_ports(self, *, options, flags, positional, input_):
+        return sorted(self.opened_ports)
+
+    def _open_port(self, *, options, flags, positional, input_):
+        (port,) = positional
+        self.opened_ports.add(port)
+
+    def _close_port(self, *, options, flags, positional, input_):
+        (port,) = positional
+        self.opened_ports.discard(port)
+
+    def _action_get(self, *, options, flags, positional, input_):
+        return self._action_parameters
+
+    def _action_log(self, *, options, flags, positional, input_):
+        (message,) = positional
+        self.action_logs.append(message)
+
+    def _action_set(self, *, options, flags, positional, input_):
+        for argument in positional:
+            key, value = argument.split("=", maxsplit=1)
+            self.action_results[key] = value
+
+    def _action_fail(self, *, options, flags, positional, input_):
+        self.action_failure = positional[0] if positional else ""
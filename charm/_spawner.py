@@ -0,0 +1,318 @@
+"""Starts hook tools from a small helper process
+
+`subprocess` forks the charm process for every hook tool call. If the charm process
+uses a lot of memory (e.g. after importing large libraries), forking it is slow.
+
+The helper process is forked while the charm process is still small (before other
+imports) and starts hook tools with `os.posix_spawn`
+
+Only imports modules that are already imported by `_context` (or are built in)—so
+that importing this module does not make the charm process larger
+"""
+
+import atexit
+import itertools
+import marshal
+import os
+import select
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+import typing
+
+from . import _context
+
+_HEADER_SIZE = 4
+
+
+def _read_exactly(fd: int, size: int, /) -> typing.Optional[bytes]:
+    """Returns `None` if pipe is closed"""
+    data = b""
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _write_all(fd: int, data: bytes, /):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _read_message(fd: int, /) -> typing.Optional[typing.Any]:
+    if (header := _read_exactly(fd, _HEADER_SIZE)) is None:
+        return None
+    if (data := _read_exactly(fd, int.from_bytes(header, "big"))) is None:
+        return None
+    return marshal.loads(data)
+
+
+def _write_message(fd: int, message: typing.Any, /):
+    data = marshal.dumps(message)
+    _write_all(fd, len(data).to_bytes(_HEADER_SIZE, "big") + data)
+
+
+def _write_input(fd: int, input_: typing.Optional[bytes]):
+    try:
+        if input_:
+            _write_all(fd, input_)
+    except BrokenPipeError:
+        # Hook tool exited without reading all of stdin
+        pass
+    finally:
+        os.close(fd)
+
+
+def _run(
+    command: typing.Sequence[str],
+    input_: typing.Optional[bytes],
+    timeout: typing.Optional[float],
+    environ: typing.Mapping[str, str],
+) -> typing.Tuple[typing.Optional[int], bytes]:
+    """Run in helper process
+
+    Returns exit code (`None` if timeout expired) and stdout
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    stdin_read, stdin_write = os.pipe()
+    stdout_read, stdout_write = os.pipe()
+    try:
+        pid = os.posix_spawnp(
+            command[0],
+            command,
+            environ,
+            file_actions=[
+                (os.POSIX_SPAWN_DUP2, stdin_read, 0),
+                (os.POSIX_SPAWN_DUP2, stdout_write, 1),
+            ],
+            # Python ignores these signals (like `subprocess`, restore default)
+            setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+        )
+    except BaseException:
+        os.close(stdin_write)
+        os.close(stdout_read)
+        raise
+    finally:
+        os.close(stdin_read)
+        os.close(stdout_write)
+    threading.Thread(
+        target=_write_input, args=(stdin_write, input_), daemon=True
+    ).start()
+    chunks = []
+    with selectors.DefaultSelector() as selector:
+        selector.register(stdout_read, selectors.EVENT_READ)
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            if not selector.select(remaining):
+                continue
+            if chunk := os.read(stdout_read, 64 * 1024):
+                chunks.append(chunk)
+            else:
+                break
+    os.close(stdout_read)
+    return _wait(pid, deadline), b"".join(chunks)
+
+
+def _exits_before(pid: int, deadline: float, /) -> bool:
+    """Wait until process exits (without reaping it) or `deadline` passes"""
+    timeout = max(deadline - time.monotonic(), 0)
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # Python < 3.9 or Linux < 5.3
+        exited = threading.Event()
+
+        def wait():
+            try:
+                # Does not reap process (so that its pid cannot be reused before it
+                # is killed)
+                os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+            finally:
+                exited.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return exited.wait(timeout)
+    try:
+        readable, _, _ = select.select([pidfd], [], [], timeout)
+    finally:
+        os.close(pidfd)
+    return bool(readable)
+
+
+def _wait(pid: int, deadline: typing.Optional[float], /) -> typing.Optional[int]:
+    """Reap process and return exit code
+
+    Process is killed (and `None` is returned) if it does not exit before `deadline`
+    """
+    killed = deadline is not None and not _exits_before(pid, deadline)
+    if killed:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    if killed:
+        return None
+    # Like `subprocess` (`os.waitstatus_to_exitcode()` requires Python 3.9)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _serve(request_fd: int, response_fd: int, /):
+    """Run in helper process"""
+    lock = threading.Lock()
+
+    def handle(id_, command, input_, timeout, environ):
+        # Exceptions are sent as tuples (`marshal` only supports built-in types)
+        try:
+            response = (id_, _run(command, input_, timeout, environ), None)
+        except OSError as exception:
+            # e.g. `FileNotFoundError` if hook tool does not exist
+            response = (
+                id_,
+                None,
+                ("OSError", exception.errno, exception.strerror, exception.filename),
+            )
+        except Exception as exception:
+            response = (id_, None, ("SubprocessError", repr(exception)))
+        with lock:
+            _write_message(response_fd, response)
+
+    # Stop when charm process closes pipe (e.g. exits)
+    while (request := _read_message(request_fd)) is not None:
+        threading.Thread(target=handle, args=request, daemon=True).start()
+
+
+def _exception(error: tuple, /) -> Exception:
+    type_, *arguments = error
+    if type_ == "OSError":
+        # Instantiates subclass for `errno` (e.g. `FileNotFoundError`)
+        return OSError(*arguments)
+    return subprocess.SubprocessError(*arguments)
+
+
+class _Call:
+    """Hook tool call that is waiting for response from helper process"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exception: typing.Optional[Exception] = None
+
+    def set_result(self, result, /):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exception: Exception, /):
+        self._exception = exception
+        self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class _Spawner:
+    """Runs in charm process. Sends hook tool commands to helper process"""
+
+    def __init__(self):
+        request_read, self._request_write = os.pipe()
+        self._response_read, response_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Helper process
+            try:
+                os.close(self._request_write)
+                os.close(self._response_read)
+                _serve(request_read, response_write)
+            finally:
+                os._exit(0)
+        self._pid = pid
+        os.close(request_read)
+        os.close(response_write)
+        self._ids = itertools.count()
+        self._write_lock = threading.Lock()
+        self._pending: typing.Dict[int, _Call] = {}
+        self._pending_lock = threading.Lock()
+        self.alive = True
+        threading.Thread(target=self._receive, daemon=True).start()
+        atexit.register(self.close)
+
+    def _receive(self):
+        while (response := _read_message(self._response_read)) is not None:
+            id_, result, error = response
+            with self._pending_lock:
+                call = self._pending.pop(id_)
+            if error is None:
+                call.set_result(result)
+            else:
+                call.set_exception(_exception(error))
+        # Helper process exited
+        with self._pending_lock:
+            self.alive = False
+            pending, self._pending = self._pending, {}
+        for call in pending.values():
+            call.set_exception(
+                subprocess.SubprocessError("Hook tool spawner helper process exited")
+            )
+
+    def close(self):
+        if self._request_write is None:
+            return
+        os.close(self._request_write)
+        self._request_write = None
+        os.waitpid(self._pid, 0)
+
+    def transport(
+        self,
+        command: typing.Sequence[str],
+        input_: typing.Optional[bytes],
+        timeout: typing.Optional[float],
+    ) -> bytes:
+        command = [str(argument) for argument in command]
+        call = _Call()
+        with self._pending_lock:
+            if not self.alive or self._request_write is None:
+                return _context._subprocess_transport(command, input_, timeout)
+            id_ = next(self._ids)
+            self._pending[id_] = call
+        try:
+            with self._write_lock:
+                _write_message(
+                    self._request_write,
+                    (id_, command, input_, timeout, dict(os.environ)),
+                )
+        except BrokenPipeError:
+            # Helper process exited
+            with self._pending_lock:
+                self._pending.pop(id_, None)
+            return _context._subprocess_transport(command, input_, timeout)
+        returncode, stdout = call.result()
+        if returncode is None:
+            raise subprocess.TimeoutExpired(command, timeout, output=stdout)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, output=stdout)
+        return stdout
+
+
+def set_up_spawner() -> None:
+    # TODO docstring: call right away (first thing after import, before other imports)
+    # TODO docstring: call only once (in charm entrypoint)
+    # TODO docstring: hook tool latency stays low even if charm process uses a lot of memory
+    if not hasattr(os, "posix_spawnp") or sys.platform != "linux":
+        # Not imported at top of module (logging is imported after spawner is set up)
+        import logging
+
+        logging.getLogger(__name__).debug(
+            "Hook tool spawner not supported on this platform"
+        )
+        return
+    _context.set_default_transport(_Spawner().transport)
@@ -1,9 +1,9 @@
 import abc
-import json
 import logging
-import subprocess
 import typing
 
+from . import _context, _json
+
 logger = logging.getLogger(__name__)
 
 
@@ -160,9 +160,7 @@ def get(*, app=False) -> typing.Optional[Status]:
     command = ["status-get", "--format", "json", "--include-data"]
     if app:
         command.append("--application")
-    result = json.loads(
-        subprocess.run(command, capture_output=True, check=True, text=True).stdout
-    )
+    result = _json.loads(_context.run(command))
     if app:
         result = result["application-status"]
     status_types: typing.Dict[str, typing.Type[Status]] = {
@@ -177,5 +175,5 @@ def set_(value: Status, *, app=False):
     command = ["status-set", value._HOOK_TOOL_CODE, str(value)]
     if app:
         command.append("--application")
-    subprocess.run(command, check=True)
+    _context.run(command)
     logger.debug(f'Set {"app" if app else "unit"}_status = {repr(value)}')
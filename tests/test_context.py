@@ -0,0 +1,114 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import charm
+from charm import _context, _logging
+
+
+def test_deadline_kills_hook_tool():
+    context = _context.HookContext({}, deadline=time.monotonic() + 0.2)
+    start = time.monotonic()
+    with _context.bind(context):
+        with pytest.raises(charm.DeadlineExceeded):
+            _context.run(["sleep", "5"])
+    assert time.monotonic() - start < 2
+
+
+def test_deadline_passed():
+    context = _context.HookContext({}, deadline=time.monotonic() - 1)
+    with _context.bind(context):
+        with pytest.raises(charm.DeadlineExceeded):
+            # Not run
+            _context.run(["does-not-exist"])
+
+
+def test_timeout_shorter_than_deadline():
+    context = _context.HookContext({}, deadline=time.monotonic() + 30)
+    with _context.bind(context):
+        with pytest.raises(subprocess.TimeoutExpired):
+            _context.run(["sleep", "5"], timeout=0.1)
+        # Deadline is closer than `timeout`
+        charm.set_hook_timeout(0.1)
+        with pytest.raises(charm.DeadlineExceeded):
+            _context.run(["sleep", "5"], timeout=30)
+
+
+def test_environment_variable_counts_from_import(monkeypatch):
+    monkeypatch.setenv("CHARM_HOOK_TIMEOUT", "5")
+    monkeypatch.setattr(_context, "_START", time.monotonic() - 10)
+    monkeypatch.setattr(_context, "_process_context", None)
+    with pytest.raises(charm.DeadlineExceeded):
+        _context.run(["true"])
+
+
+def test_set_hook_timeout_keeps_cached_objects():
+    simulator = charm.Simulator(unit="db/0")
+
+    def handler():
+        event = charm.event
+        charm.set_hook_timeout(30)
+        assert _context.current().deadline is not None
+        assert charm.event is event
+        charm.set_hook_timeout(None)
+        assert _context.current().deadline is None
+        assert charm.event is event
+
+    simulator.run("install", handler)
+
+
+def test_juju_log_timeout_does_not_use_deadline(capsys):
+    timeouts = []
+
+    def transport(command, input_, timeout):
+        timeouts.append(timeout)
+        raise subprocess.TimeoutExpired(command, timeout)
+
+    context = _context.HookContext(
+        {}, transport=transport, deadline=time.monotonic() + 30
+    )
+    logger = logging.getLogger("test_juju_log_timeout")
+    logger.propagate = False
+    logger.addHandler(_logging._Handler())
+    with _context.bind(context):
+        logger.warning("first")
+        logger.warning("second")
+    assert timeouts == [_logging._TIMEOUT]
+    stderr = capsys.readouterr().err
+    assert "WARNING: first" in stderr
+    assert "WARNING: second" in stderr
+
+
+def test_context_is_immutable():
+    context = _context.HookContext({"JUJU_UNIT_NAME": "db/0"})
+    with pytest.raises(AttributeError):
+        context._budget = None
+    with pytest.raises(TypeError):
+        context.environ["JUJU_UNIT_NAME"] = "db/1"
+    with _context.bind(context):
+        charm.set_hook_timeout(30)
+    assert context.deadline is not None
+
+
+def test_deadline_starts_when_charm_is_imported():
+    code = (
+        "import time\n"
+        "import charm\n"
+        "time.sleep(1)\n"
+        "try:\n"
+        "    charm.is_leader\n"
+        "except charm.DeadlineExceeded:\n"
+        "    print('deadline exceeded')\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(charm.__file__)),
+        env={**os.environ, "CHARM_HOOK_TIMEOUT": "0.5", "JUJU_UNIT_NAME": "db/0"},
+    ).stdout
+    assert output == b"deadline exceeded\n"
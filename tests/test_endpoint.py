@@ -0,0 +1,182 @@
+import subprocess
+
+import pytest
+
+import charm
+
+
+class _CountingSimulator(charm.Simulator):
+    """Counts `relation-set` calls and fails them for `failing_relation_ids`"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writes = []
+        self.failing_relation_ids = set()
+
+    def _relation_set(self, *, options, flags, positional, input_):
+        relation_id = int(options["--relation"])
+        if relation_id in self.failing_relation_ids:
+            raise ValueError("permission denied")
+        self.writes.append(relation_id)
+        return super()._relation_set(
+            options=options, flags=flags, positional=positional, input_=input_
+        )
+
+
+@pytest.fixture
+def simulator():
+    simulator = _CountingSimulator(unit="db/0", leader=True)
+    for index in range(5):
+        simulator.add_relation("database", remote_app=f"client{index}")
+    return simulator
+
+
+def _run(simulator, function):
+    return simulator.run("update-status", lambda: function(charm.Endpoint("database")))
+
+
+def test_broadcast(simulator):
+    failures = _run(simulator, lambda endpoint: endpoint.broadcast({"foo": "bar"}))
+    assert failures == {}
+    for relation_id in range(5):
+        assert simulator.databag(relation_id, "db/0") == {"foo": "bar"}
+
+
+def test_broadcast_callable_and_app(simulator):
+    failures = _run(
+        simulator,
+        lambda endpoint: endpoint.broadcast(
+            lambda relation: {"id": str(relation.id)}, app=True
+        ),
+    )
+    assert failures == {}
+    for relation_id in range(5):
+        assert simulator.databag(relation_id, "db") == {"id": str(relation_id)}
+
+
+def test_broadcast_skips_unchanged_relations(simulator):
+    simulator.databag(1, "db/0")["foo"] = "bar"
+    simulator.databag(3, "db/0").update({"foo": "bar", "other": "value"})
+    _run(simulator, lambda endpoint: endpoint.broadcast({"foo": "bar"}))
+    assert sorted(simulator.writes) == [0, 2, 4]
+    assert simulator.databag(3, "db/0") == {"foo": "bar", "other": "value"}
+
+
+def test_broadcast_deletes_none(simulator):
+    simulator.databag(0, "db/0").update({"foo": "bar", "other": "value"})
+    _run(simulator, lambda endpoint: endpoint.broadcast({"foo": None}))
+    assert simulator.databag(0, "db/0") == {"other": "value"}
+    # Already deleted
+    assert sorted(simulator.writes) == [0]
+
+
+def test_broadcast_failure_does_not_stop_other_relations(simulator):
+    simulator.failing_relation_ids = {2}
+    failures = _run(simulator, lambda endpoint: endpoint.broadcast({"foo": "bar"}))
+    assert [relation.id for relation in failures] == [2]
+    assert isinstance(failures[charm.Relation(2)], subprocess.CalledProcessError)
+    assert simulator.databag(2, "db/0") == {}
+    for relation_id in (0, 1, 3, 4):
+        assert simulator.databag(relation_id, "db/0") == {"foo": "bar"}
+
+
+def test_broadcast_app_requires_leader(simulator):
+    simulator.leader = False
+    with pytest.raises(ValueError):
+        _run(simulator, lambda endpoint: endpoint.broadcast({"foo": "bar"}, app=True))
+    assert simulator.writes == []
+
+
+def test_reconcile(simulator):
+    simulator.databag(0, "db/0").update({"keep": "1", "change": "old", "stale": "x"})
+    simulator.databag(0, "db").update({"stale": "x"})
+    result = _run(
+        simulator,
+        lambda endpoint: endpoint.reconcile(
+            my_unit={"keep": "1", "change": "new", "add": "2"}, my_app={"foo": "bar"}
+        ),
+    )
+    assert result.failures == {}
+    assert simulator.databag(0, "db/0") == {"keep": "1", "change": "new", "add": "2"}
+    assert simulator.databag(0, "db") == {"foo": "bar"}
+    (unit_diff,) = [
+        diff
+        for diff in result.diffs
+        if diff.relation.id == 0 and diff.unit_or_app == "db/0"
+    ]
+    assert dict(unit_diff.changed) == {"change": "new", "add": "2"}
+    assert unit_diff.deleted == {"stale"}
+    # One `relation-set` per databag
+    assert simulator.writes.count(0) == 2
+
+
+def test_reconcile_skips_unchanged_relations(simulator):
+    simulator.databag(1, "db/0")["foo"] = "bar"
+    simulator.databag(3, "db/0")["foo"] = "bar"
+    result = _run(
+        simulator, lambda endpoint: endpoint.reconcile(my_unit={"foo": "bar"})
+    )
+    assert sorted(simulator.writes) == [0, 2, 4]
+    assert sorted(diff.relation.id for diff in result.diffs) == [0, 2, 4]
+    # Running again writes nothing
+    simulator.writes.clear()
+    result = _run(
+        simulator, lambda endpoint: endpoint.reconcile(my_unit={"foo": "bar"})
+    )
+    assert simulator.writes == []
+    assert result.diffs == []
+
+
+def test_reconcile_none_is_deleted(simulator):
+    simulator.databag(0, "db/0").update({"foo": "bar", "other": "value"})
+    result = _run(
+        simulator,
+        lambda endpoint: endpoint.reconcile(my_unit={"foo": None, "other": "value"}),
+    )
+    assert simulator.databag(0, "db/0") == {"other": "value"}
+    (diff,) = [diff for diff in result.diffs if diff.relation.id == 0]
+    assert dict(diff.changed) == {}
+    assert diff.deleted == {"foo"}
+
+
+def test_reconcile_does_not_delete_juju_keys(simulator):
+    juju_keys = {
+        "egress-subnets": "10.0.0.1/32",
+        "ingress-address": "10.0.0.1",
+        "private-address": "10.0.0.1",
+    }
+    for relation_id in range(5):
+        simulator.databag(relation_id, "db/0").update(juju_keys)
+    simulator.databag(0, "db/0")["stale"] = "x"
+    result = _run(
+        simulator,
+        lambda endpoint: endpoint.reconcile(my_unit={"ingress-address": None}),
+    )
+    assert [diff.relation.id for diff in result.diffs] == [0]
+    assert result.diffs[0].deleted == {"stale"}
+    for relation_id in range(5):
+        assert simulator.databag(relation_id, "db/0") == juju_keys
+
+
+def test_reconcile_failure_does_not_stop_other_relations(simulator):
+    simulator.failing_relation_ids = {2}
+    result = _run(
+        simulator,
+        lambda endpoint: endpoint.reconcile(
+            my_unit=lambda relation: {"id": str(relation.id)}
+        ),
+    )
+    assert [relation.id for relation in result.failures] == [2]
+    assert sorted(diff.relation.id for diff in result.diffs) == [0, 1, 3, 4]
+    for relation_id in (0, 1, 3, 4):
+        assert simulator.databag(relation_id, "db/0") == {"id": str(relation_id)}
+
+
+def test_reconcile_app_requires_leader(simulator):
+    simulator.leader = False
+    with pytest.raises(ValueError):
+        _run(simulator, lambda endpoint: endpoint.reconcile(my_app={"foo": "bar"}))
+    assert simulator.writes == []
+    # Unit databag does not require leadership
+    _run(simulator, lambda endpoint: endpoint.reconcile(my_unit={"foo": "bar"}))
+    assert sorted(simulator.writes) == [0, 1, 2, 3, 4]
@@ -0,0 +1,184 @@
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+import charm
+from charm import _jobs
+
+
+class _Simulator(charm.Simulator):
+    def __init__(self, charm_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.charm_dir = charm_dir
+
+    def _environ(self, hook):
+        return {**super()._environ(hook), "JUJU_CHARM_DIR": str(self.charm_dir)}
+
+
+@pytest.fixture
+def run(tmp_path):
+    simulator = _Simulator(tmp_path / "charm", unit="db/0")
+    return lambda handler: simulator.run("update-status", handler)
+
+
+def _wait_for(run, name, predicate, timeout=10):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        job = charm.Job(name)
+        if run(lambda: predicate(job)):
+            return
+        time.sleep(0.02)
+    raise TimeoutError
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_succeeded(tmp_path, run):
+    assert run(lambda: charm.Job("never").state) is None
+    job = run(lambda: charm.Job.start("true", ["true"]))
+    _wait_for(run, "true", lambda job: not job.running)
+    assert run(lambda: (job.state, job.returncode, job.status)) == (
+        "succeeded",
+        0,
+        None,
+    )
+    record = run(lambda: job._record)
+    assert record["command"] == ["true"]
+    assert record["unit"] == "db/0"
+    assert record["finished"] >= record["started"]
+    # Directory is next to (not inside) charm directory
+    assert (tmp_path / "charm-api-jobs" / "true.json").exists()
+
+
+def test_failed(run):
+    job = run(lambda: charm.Job.start("false", ["false"]))
+    _wait_for(run, "false", lambda job: not job.running)
+    assert run(lambda: (job.state, job.returncode)) == ("failed", 1)
+    # Command that does not exist
+    job = run(lambda: charm.Job.start("missing", ["does-not-exist"]))
+    _wait_for(run, "missing", lambda job: not job.running)
+    assert run(lambda: (job.state, job.returncode)) == ("failed", None)
+    assert "Failed to run job command" in run(
+        lambda: (_jobs._directory() / "missing.log").read_text()
+    )
+
+
+def test_handshake(run):
+    job = run(lambda: charm.Job.start("sleep", ["sleep", "30"]))
+    record = run(lambda: job._record)
+    try:
+        assert record["state"] == "running"
+        assert record["returncode"] is None
+        # Worker is detached (in its own session) and records its own pid
+        assert os.getsid(record["pid"]) == record["pid"]
+        assert run(lambda: job.running)
+        with pytest.raises(ValueError):
+            run(lambda: charm.Job.start("sleep", ["sleep", "30"]))
+    finally:
+        os.killpg(record["pid"], signal.SIGKILL)
+        os.waitpid(record["pid"], 0)
+
+
+def test_worker_does_not_run_command_if_start_fails(tmp_path, run, monkeypatch):
+    run(lambda: charm.Job.start("touch", ["true"]))
+    _wait_for(run, "touch", lambda job: not job.running)
+    workers = []
+    popen = _jobs.subprocess.Popen
+
+    def record_popen(*args, **kwargs):
+        workers.append(popen(*args, **kwargs))
+        return workers[-1]
+
+    def fail(path, content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(_jobs.subprocess, "Popen", record_popen)
+    monkeypatch.setattr(_jobs, "_write_atomically", fail)
+    marker = tmp_path / "marker"
+    with pytest.raises(OSError):
+        run(lambda: charm.Job.start("touch", ["touch", str(marker)]))
+    (worker,) = workers
+    # Worker exits when it sees the previous job's record (with a different pid)
+    assert worker.wait(timeout=10) == 0
+    assert not marker.exists()
+    assert run(lambda: charm.Job("touch").state) == "succeeded"
+
+
+def test_failed_when_worker_dies(run):
+    job = run(lambda: charm.Job.start("sleep", ["sleep", "30"]))
+    pid = run(lambda: job._record["pid"])
+    os.killpg(pid, signal.SIGKILL)
+    # Reap worker (otherwise it counts as running)
+    os.waitpid(pid, 0)
+    assert run(lambda: job.state) == "failed"
+    assert run(lambda: job.status) is None
+    # Job can be started again
+    job = run(lambda: charm.Job.start("sleep", ["true"]))
+    _wait_for(run, "sleep", lambda job: not job.running)
+    assert run(lambda: job.state) == "succeeded"
+
+
+def test_progress_and_status(run):
+    job = run(
+        lambda: charm.Job.start(
+            "progress",
+            _python(
+                "import time\n"
+                "from charm import Job\n"
+                "Job.report_progress('halfway')\n"
+                "time.sleep(30)\n"
+            ),
+        )
+    )
+    pid = run(lambda: job._record["pid"])
+    try:
+        _wait_for(run, "progress", lambda job: job.progress is not None)
+        assert run(lambda: job.progress) == "halfway"
+        assert run(lambda: job.status) == charm.MaintenanceStatus("progress: halfway")
+    finally:
+        os.killpg(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    # Progress is cleared when job is started again
+    job = run(lambda: charm.Job.start("progress", ["sleep", "30"]))
+    pid = run(lambda: job._record["pid"])
+    try:
+        assert run(lambda: job.progress) is None
+        assert run(lambda: job.status) == charm.MaintenanceStatus("progress: running")
+    finally:
+        os.killpg(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+
+def test_report_progress_outside_job(monkeypatch):
+    monkeypatch.delenv(_jobs._PROGRESS_FILE_ENVIRONMENT_VARIABLE, raising=False)
+    with pytest.raises(RuntimeError):
+        charm.Job.report_progress("halfway")
+
+
+def test_hook_environment_is_removed(tmp_path, run, monkeypatch):
+    monkeypatch.setenv("JUJU_CONTEXT_ID", "db/0-update-status-1")
+    monkeypatch.setenv("CHARM_HOOK_TIMEOUT", "30")
+    monkeypatch.setenv("OTHER", "value")
+    output = tmp_path / "environ"
+    run(lambda: charm.Job.start("env", ["sh", "-c", f"env > {output}"]))
+    _wait_for(run, "env", lambda job: not job.running)
+    environ = dict(
+        line.split("=", maxsplit=1) for line in output.read_text().splitlines()
+    )
+    assert not [key for key in environ if key.startswith("JUJU_")]
+    assert "CHARM_HOOK_TIMEOUT" not in environ
+    assert environ["OTHER"] == "value"
+    assert environ[_jobs._PROGRESS_FILE_ENVIRONMENT_VARIABLE].endswith(
+        "charm-api-jobs/env.progress"
+    )
+
+
+@pytest.mark.parametrize("name", ["a/b", ".hidden", "../escape"])
+def test_invalid_name(name):
+    with pytest.raises(ValueError):
+        charm.Job(name)
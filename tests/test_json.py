@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from charm import _json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@pytest.fixture(
+    params=[
+        "json",
+        pytest.param(
+            "orjson",
+            marks=pytest.mark.skipif(orjson is None, reason="orjson not installed"),
+        ),
+    ],
+    autouse=True,
+)
+def backend(request, monkeypatch):
+    """Run every test with the standard library and with orjson"""
+    if request.param == "json":
+        monkeypatch.setattr(_json, "_loads", json.loads)
+    else:
+        monkeypatch.setattr(_json, "_loads", orjson.loads)
+    return request.param
+
+
+_VALUES = [
+    {},
+    {"a": 1},
+    {"quote": 'say "hi"', 'key "with" quotes': "value"},
+    {"backslashes": "\\", "two": "\\\\", "three\\\\\\": '\\\\\\"'},
+    {"ends with backslash\\": "\\", "": ""},
+    {"unicode": "café ☃ \U0001f600", "café": "\x00\x1f"},
+    {
+        "nested": {"a": ["}", "]", "{", "[", {"b": '"}]'}], "c": {"d": "\\"}},
+        "after": [[], {}, [{}], "[{"],
+    },
+    {"numbers": [0, -1, 1.5, 1e100, -2.5e-3], "literals": [True, False, None]},
+    {"certificate": "-----BEGIN-----\\n" + 'A\\"B' * 1000 + "\\n-----END-----"},
+]
+
+
+@pytest.mark.parametrize("value", _VALUES)
+@pytest.mark.parametrize(
+    "dumps",
+    [
+        json.dumps,
+        lambda value: json.dumps(value, ensure_ascii=False),
+        lambda value: json.dumps(value, indent=2),
+        lambda value: json.dumps(value, indent="\t", separators=(" ,", " : ")),
+        lambda value: f" \r\n\t{json.dumps(value, indent=1)}\n\n ",
+    ],
+)
+def test_loads_lazy(value, dumps):
+    data = dumps(value).encode()
+    lazy = _json.loads_lazy(data)
+    assert list(lazy) == list(value)
+    assert dict(lazy) == value == _json.loads(data) == json.loads(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"   ",
+        b"{",
+        b'{"a":1,}',
+        b'{"a" 1}',
+        b'{"a":}',
+        b'{"a":1 "b":2}',
+        b'{"a":1',
+        b"{a:1}",
+        b'{"a":"unterminated}',
+        b'{"a\\":1}',
+        b'{"a":"b\\\\\\"}',
+        b'{"a":1}}',
+        b'{"a":1} {"b":2}',
+        b'{"a":1} x',
+        # Whitespace that is not allowed in JSON
+        b'{\x0c"a":1}',
+        b'{"a":1\x0b}',
+    ],
+)
+def test_loads_lazy_invalid(data):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(data)
+    with pytest.raises(json.JSONDecodeError):
+        _json.loads_lazy(data)
+    with pytest.raises(json.JSONDecodeError):
+        _json.loads(data)
+
+
+@pytest.mark.parametrize("data", [b"[]", b'"a"', b"1", b"null"])
+def test_loads_lazy_not_object(data):
+    with pytest.raises(json.JSONDecodeError):
+        _json.loads_lazy(data)
+
+
+def test_values_are_decoded_when_accessed():
+    lazy = _json.loads_lazy(b'{"valid": [1, 2], "invalid": [1, 2,]}')
+    assert lazy["valid"] == [1, 2]
+    with pytest.raises(json.JSONDecodeError):
+        lazy["invalid"]
+    assert "invalid" in lazy
+    assert len(lazy) == 2
+
+
+def test_duplicate_keys():
+    # Last value is used (like `json.loads()`)
+    data = b'{"a": 1, "b": 2, "a": 3}'
+    assert dict(_json.loads_lazy(data)) == json.loads(data) == {"a": 3, "b": 2}
@@ -0,0 +1,350 @@
+import http.server
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+import charm
+from charm import _context, _pebble
+
+_BOUNDARY = "stand-in-boundary"
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    """Stand-in for Pebble's API"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        super().__init__(socket_path, _Handler)
+        self.connections = 0
+        self.layers = []
+        self.actions = []
+        self.files = {}
+        # Size of every chunk of chunked request bodies
+        self.request_chunk_sizes = []
+        # Close connection (without telling the client) after each response
+        self.close_after_response = False
+        # Bytes & seconds between pieces of response body for `GET /v1/files`
+        self.slow_read = None
+        # Number of requests to close connection after (without responding)
+        self.drop_requests = 0
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Server
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while size := int(self.rfile.readline().strip(), 16):
+                self.server.request_chunk_sizes.append(size)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b"".join(chunks)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _respond(self, body: bytes, *, status=200, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.server.slow_read is not None and self.command == "GET":
+            size, interval = self.server.slow_read
+            for index in range(0, len(body), size):
+                self.wfile.write(body[index : index + size])
+                time.sleep(interval)
+        else:
+            self.wfile.write(body)
+        if self.server.close_after_response:
+            self.close_connection = True
+
+    def _json(self, result, *, status=200, type_="sync", change=None):
+        body = {"type": type_, "status-code": status, "result": result}
+        if change is not None:
+            body["change"] = change
+        self._respond(json.dumps(body).encode(), status=status)
+
+    def _error(self, message, *, status=400, kind=None):
+        self._json({"message": message, "kind": kind}, status=status, type_="error")
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/v1/changes/1/wait":
+            self._json({"id": "1", "status": "Done", "err": None})
+        elif path == "/v1/services":
+            self._json([{"name": name} for name in self.server.layers])
+        elif path == "/v1/files":
+            self._read_file(query.split("path=")[1].replace("%2F", "/"))
+        else:
+            self._error("not found", status=404)
+
+    def _read_file(self, path):
+        if path in self.server.files:
+            parts = (
+                f"--{_BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="files"; filename="{path}"\r\n\r\n'
+            ).encode() + self.server.files[path]
+            result = [{"path": path}]
+        else:
+            parts = b""
+            result = [
+                {
+                    "path": path,
+                    "error": {"message": "no such file", "kind": "not-found"},
+                }
+            ]
+        response = json.dumps({"type": "sync", "status-code": 200, "result": result})
+        if parts:
+            parts += b"\r\n"
+        parts += (
+            f"--{_BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="response"\r\n\r\n'
+            f"{response}\r\n"
+            f"--{_BOUNDARY}--\r\n"
+        ).encode()
+        self._respond(parts, content_type=f"multipart/form-data; boundary={_BOUNDARY}")
+
+    def _drop(self) -> bool:
+        if self.server.drop_requests:
+            self.server.drop_requests -= 1
+            self.close_connection = True
+            return True
+        return False
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == "/v1/layers":
+            self.server.layers.append(json.loads(body))
+            if not self._drop():
+                self._json(True)
+        elif self.path == "/v1/services":
+            request = json.loads(body)
+            if "unknown" in request["services"]:
+                self._error('service "unknown" does not exist', kind="not-found")
+                return
+            self.server.actions.append((request["action"], request["services"]))
+            if not self._drop():
+                self._json(None, type_="async", change="1")
+        elif self.path == "/v1/files":
+            self._write_files(body)
+        else:
+            self._error("not found", status=404)
+
+    def _write_files(self, body: bytes):
+        boundary = self.headers.get_param("boundary").encode()
+        parts = (b"\r\n" + body).split(b"\r\n--" + boundary)
+        # Before first part & after last part
+        parts = parts[1:-1]
+        request = json.loads(parts[0].split(b"\r\n\r\n", maxsplit=1)[1])
+        _, content = parts[1].split(b"\r\n\r\n", maxsplit=1)
+        (file,) = request["files"]
+        if file["path"].startswith("/forbidden/"):
+            result = [
+                {
+                    "path": file["path"],
+                    "error": {"message": "permission denied", "kind": "permission"},
+                }
+            ]
+        else:
+            self.server.files[file["path"]] = content
+            result = [{"path": file["path"]}]
+        self._json(result)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = _Server(str(tmp_path / "pebble.socket"))
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pebble(server):
+    pebble = charm.Pebble(server.server_address)
+    yield pebble
+    pebble.close()
+
+
+def test_connection_is_reused(server, pebble):
+    pebble.add_layer("base", {"services": {"a": {"command": "a"}}})
+    pebble.start_services(["a"])
+    pebble.push("/etc/foo", b"foo")
+    destination = io.BytesIO()
+    pebble.pull("/etc/foo", destination)
+    pebble.get_services()
+    assert destination.getvalue() == b"foo"
+    assert server.connections == 1
+
+
+def test_reconnect_after_idle_close(server, pebble):
+    server.close_after_response = True
+    pebble.start_services(["a"])
+    pebble.restart_services(["a"])
+    assert server.actions == [("start", ["a"]), ("restart", ["a"])]
+    # One connection per request (2 service actions & 2 waits for changes)
+    assert server.connections == 4
+
+
+def test_reconnect_does_not_resend_request(server, pebble):
+    pebble.get_services()
+    # Pebble received the request but the connection closed before the response
+    server.drop_requests = 1
+    with pytest.raises(ConnectionError):
+        pebble.start_services(["a"])
+    assert server.actions == [("start", ["a"])]
+    server.drop_requests = 1
+    with pytest.raises(ConnectionError):
+        pebble.add_layer("base", {"services": {"a": {"command": "a"}}})
+    assert len(server.layers) == 1
+    # Connection is usable again
+    pebble.restart_services(["a"])
+    assert server.actions == [("start", ["a"]), ("restart", ["a"])]
+
+
+def test_push_is_chunked(server, pebble):
+    content = os.urandom(5 * _pebble._CHUNK_SIZE + 123)
+    pebble.push("/data/big", io.BytesIO(content), make_dirs=True)
+    assert server.files["/data/big"] == content
+    assert len(server.request_chunk_sizes) > 5
+    assert max(server.request_chunk_sizes) <= _pebble._CHUNK_SIZE
+
+
+def test_push_error(server, pebble):
+    with pytest.raises(charm.PebbleError) as exception_info:
+        pebble.push("/forbidden/foo", b"foo")
+    assert exception_info.value.kind == "permission"
+    # Connection is still usable
+    pebble.push("/etc/foo", b"foo")
+    assert server.connections == 1
+
+
+def test_pull_streams_payload_with_partial_boundary(server, pebble):
+    partial_delimiter = f"\r\n--{_BOUNDARY[:-1]}".encode()
+    content = b"".join(
+        os.urandom(index) + partial_delimiter[: index % (len(partial_delimiter) + 1)]
+        for index in range(400)
+    )
+    content += partial_delimiter
+    server.files["/data/tricky"] = content
+    destination = io.BytesIO()
+    pebble.pull("/data/tricky", destination)
+    assert destination.getvalue() == content
+
+
+def test_pull_in_small_pieces(server, pebble):
+    content = os.urandom(3 * _pebble._CHUNK_SIZE) + f"\r\n--{_BOUNDARY}".encode()[:-2]
+    server.files["/data/big"] = content
+    server.slow_read = (997, 0)
+    destination = io.BytesIO()
+    pebble.pull("/data/big", destination)
+    assert destination.getvalue() == content
+
+
+def test_pull_error(server, pebble):
+    with pytest.raises(charm.PebbleError) as exception_info:
+        pebble.pull("/does/not/exist", io.BytesIO())
+    assert exception_info.value.kind == "not-found"
+    assert server.connections == 1
+
+
+def test_error_response(server, pebble):
+    with pytest.raises(charm.PebbleError) as exception_info:
+        pebble.start_services(["unknown"])
+    assert exception_info.value.code == 400
+    assert exception_info.value.kind == "not-found"
+    pebble.start_services(["a"])
+    assert server.connections == 1
+
+
+def test_batch_keeps_order(server, pebble):
+    with pebble.batch():
+        pebble.add_layer("base", {"services": {"a": {"command": "a"}}})
+        pebble.start_services(["a"])
+        pebble.start_services(["b", "a"])
+        pebble.stop_services(["a"])
+        pebble.replan()
+        pebble.replan()
+        pebble.add_layer("base", {"services": {"b": {"command": "b"}}})
+    assert server.actions == [
+        ("start", ["a", "b"]),
+        ("stop", ["a"]),
+        ("replan", []),
+    ]
+    assert [json.loads(layer["layer"]) for layer in server.layers] == [
+        {"services": {"a": {"command": "a"}}},
+        {"services": {"b": {"command": "b"}}},
+    ]
+
+
+def test_batch_does_not_merge_layers():
+    layers = []
+
+    def add_layer(label, layer, *, combine):
+        layers.append((label, layer, combine))
+
+    pebble = charm.Pebble("/does/not/exist")
+    pebble._add_layer = add_layer
+    with pebble.batch():
+        pebble.add_layer(
+            "base", {"services": {"a": {"override": "replace", "command": "a"}}}
+        )
+        # Pebble merges this into the service above (and keeps "command")
+        pebble.add_layer(
+            "base", {"services": {"a": {"override": "merge", "user": "app"}}}
+        )
+        pebble.add_layer("other", {"checks": {}}, combine=False)
+    assert layers == [
+        ("base", {"services": {"a": {"override": "replace", "command": "a"}}}, True),
+        ("base", {"services": {"a": {"override": "merge", "user": "app"}}}, True),
+        ("other", {"checks": {}}, False),
+    ]
+
+
+def test_batch_not_sent_on_exception(server, pebble):
+    with pytest.raises(RuntimeError):
+        with pebble.batch():
+            pebble.start_services(["a"])
+            raise RuntimeError
+    assert server.actions == []
+
+
+def test_deadline_applies_to_whole_response(server, pebble):
+    server.files["/data/slow"] = os.urandom(10 * 1000)
+    # Each piece arrives before the deadline, but the response does not
+    server.slow_read = (1000, 0.2)
+    context = _context.HookContext({}, deadline=time.monotonic() + 0.5)
+    start = time.monotonic()
+    with _context.bind(context):
+        with pytest.raises(charm.DeadlineExceeded):
+            pebble.pull("/data/slow", io.BytesIO())
+    assert time.monotonic() - start < 1.5
+
+
+def test_clients_per_hook_context():
+    first = _context.HookContext({})
+    second = _context.HookContext({})
+    container = charm.Container("workload")
+    with _context.bind(first):
+        pebble = container.pebble
+        assert container.pebble is pebble
+    with _context.bind(second):
+        assert container.pebble is not pebble
@@ -0,0 +1,83 @@
+import pytest
+
+import charm
+
+
+@pytest.fixture
+def simulator():
+    simulator = charm.Simulator(unit="db/0")
+    simulator.add_relation("peers", remote_units=["db/1", "db/2", "db/10"])
+    simulator.databag(0, "db/0").update({"version": "9", "role": "primary"})
+    simulator.databag(0, "db/1").update({"version": "100", "role": "replica"})
+    simulator.databag(0, "db/2").update({"role": "replica"})
+    simulator.databag(0, "db/10").update({"version": "10", "other": "x"})
+    return simulator
+
+
+def _table(simulator, keys):
+    return simulator.run(
+        "update-status",
+        lambda: charm.PeerRelation.from_endpoint("peers").table(keys=keys),
+    )
+
+
+def test_table(simulator):
+    table = _table(simulator, ["version", "role", "missing"])
+    assert list(table) == ["db/0", "db/1", "db/2", "db/10"]
+    assert all(isinstance(unit, charm.Unit) for unit in table)
+    assert len(table) == 4
+    assert dict(table["db/2"]) == {"version": None, "role": "replica", "missing": None}
+    # Keys that were not loaded are not included
+    assert dict(table["db/10"]) == {"version": "10", "role": None, "missing": None}
+    assert dict(table.column("version")) == {
+        charm.Unit("db/0"): "9",
+        charm.Unit("db/1"): "100",
+        charm.Unit("db/2"): None,
+        charm.Unit("db/10"): "10",
+    }
+    with pytest.raises(KeyError):
+        table["db/3"]
+    with pytest.raises(KeyError):
+        table.column("other")
+
+
+def test_unit_and_str_lookups(simulator):
+    table = _table(simulator, ["role"])
+    assert table[charm.Unit("db/1")] is not None
+    assert dict(table[charm.Unit("db/1")]) == dict(table["db/1"])
+    assert charm.Unit("db/1") in table
+    assert "db/1" in table
+    assert "db/3" not in table
+    assert table.column("role")[charm.Unit("db/0")] == "primary"
+    assert table.column("role")["db/0"] == "primary"
+
+
+def test_where_and_group_by(simulator):
+    table = _table(simulator, ["role"])
+    assert table.where("role", "replica") == ["db/1", "db/2"]
+    assert table.where("role", None) == ["db/10"]
+    assert table.where("role", lambda value: value != "replica") == ["db/0", "db/10"]
+    assert table.group_by("role") == {
+        "primary": ["db/0"],
+        "replica": ["db/1", "db/2"],
+        None: ["db/10"],
+    }
+
+
+def test_max_and_min(simulator):
+    table = _table(simulator, ["version", "missing"])
+    # Numeric (not string) comparison
+    assert table.max("version", type_=int) == "db/1"
+    assert table.min("version", type_=int) == "db/0"
+    assert table.max("version", type_=str) == "db/0"
+    # Units without key are ignored
+    assert table.max("missing", type_=int) is None
+    assert table.min("missing", type_=int) is None
+
+
+def test_max_requires_type(simulator):
+    table = _table(simulator, ["version"])
+    with pytest.raises(TypeError):
+        table.max("version")
+    with pytest.raises(TypeError):
+        table.min("version")
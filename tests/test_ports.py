@@ -0,0 +1,43 @@
+import pytest
+
+import charm
+
+
+@pytest.mark.parametrize(
+    "value", ["0/tcp", "65536/tcp", "70000/udp", "90-80/tcp", "0-80/tcp", "80/sctp"]
+)
+def test_invalid_port(value):
+    with pytest.raises(ValueError):
+        charm.Port(value)
+
+
+def test_port():
+    assert charm.Port("80-80/TCP") == "80/tcp"
+    port = charm.Port("8000-8100/udp")
+    assert (port.from_port, port.to_port, port.protocol) == (8000, 8100, "udp")
+    assert charm.Port("1/tcp").from_port == 1
+    assert charm.Port("65535/tcp").to_port == 65535
+
+
+def test_set_only_changes_differences():
+    simulator = charm.Simulator(unit="db/0")
+    simulator.opened_ports = {"80/tcp", "443/tcp"}
+
+    def handler():
+        charm.opened_ports = ["443/tcp", "8000-8100/udp"]
+        return charm.opened_ports
+
+    assert simulator.run("config-changed", handler) == {"443/tcp", "8000-8100/udp"}
+    assert simulator.opened_ports == {"443/tcp", "8000-8100/udp"}
+
+
+def test_set_invalid_port_does_not_close_ports():
+    simulator = charm.Simulator(unit="db/0")
+    simulator.opened_ports = {"80/tcp"}
+
+    def handler():
+        charm.opened_ports = ["443/tcp", "70000/tcp"]
+
+    with pytest.raises(ValueError):
+        simulator.run("config-changed", handler)
+    assert simulator.opened_ports == {"80/tcp"}
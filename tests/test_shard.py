@@ -0,0 +1,109 @@
+import json
+
+import charm
+
+_ITEMS = list(range(50)) + [f"client{index}" for index in range(50)]
+
+
+class _CountingSimulator(charm.Simulator):
+    """Counts `relation-set` calls"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.writes = 0
+
+    def _relation_set(self, *, options, flags, positional, input_):
+        self.writes += 1
+        return super()._relation_set(
+            options=options, flags=flags, positional=positional, input_=input_
+        )
+
+
+def _simulator(this_unit, units):
+    simulator = _CountingSimulator(unit=this_unit)
+    simulator.add_relation(
+        "peers", remote_units=[unit for unit in units if unit != this_unit]
+    )
+    return simulator
+
+
+def _shard(simulator, items=_ITEMS):
+    return simulator.run(
+        "update-status",
+        lambda: charm.PeerRelation.from_endpoint("peers").shard(items),
+    )
+
+
+def _assignment(units, items=_ITEMS):
+    """Items owned by each unit (with each unit's own view of the relation)"""
+    return {unit: _shard(_simulator(unit, units), items) for unit in units}
+
+
+def test_assignment_is_disjoint_and_complete():
+    units = ["db/0", "db/1", "db/2", "db/10"]
+    assignment = _assignment(units)
+    owned = [item for items in assignment.values() for item in items]
+    assert sorted(owned, key=str) == sorted(_ITEMS, key=str)
+    assert len(owned) == len(set(owned))
+    # Every unit owns some items
+    assert all(assignment.values())
+    # Same assignment regardless of order of items
+    assert _assignment(units, list(reversed(_ITEMS))) == {
+        unit: list(reversed(items)) for unit, items in assignment.items()
+    }
+
+
+def test_membership_change_only_moves_that_units_items():
+    units = ["db/0", "db/1", "db/2"]
+    before = _assignment(units)
+    after = _assignment([*units, "db/3"])
+    # New unit only takes items from existing units
+    for unit in units:
+        assert set(after[unit]) == set(before[unit]) - set(after["db/3"])
+    assert after["db/3"]
+    # Removed unit's items are spread over the remaining units
+    removed = _assignment(["db/0", "db/2"])
+    for unit in ("db/0", "db/2"):
+        assert set(removed[unit]) - set(before[unit]) <= set(before["db/1"])
+        assert set(before[unit]) <= set(removed[unit])
+
+
+def test_ownership_is_recorded_once():
+    simulator = _simulator("db/0", ["db/0", "db/1"])
+    owned = _shard(simulator)
+    assert simulator.writes == 1
+    assert json.loads(simulator.databag(0, "db/0")["shard"]) == sorted(
+        str(item) for item in owned
+    )
+    # Unchanged
+    assert _shard(simulator) == owned
+    assert simulator.writes == 1
+    # Changed
+    _shard(simulator, _ITEMS[:10])
+    assert simulator.writes == 2
+
+
+def test_shard_owners():
+    units = ["db/0", "db/1", "db/2"]
+    assignment = _assignment(units)
+    simulator = _simulator("db/0", units)
+    for unit in units:
+        simulator.databag(0, unit)["shard"] = json.dumps(
+            sorted(str(item) for item in assignment[unit])
+        )
+    owners = simulator.run(
+        "update-status",
+        lambda: charm.PeerRelation.from_endpoint("peers").shard_owners(),
+    )
+    assert owners == {
+        str(item): [charm.Unit(unit)] for unit in units for item in assignment[unit]
+    }
+    # Unit that has not called `shard()` yet
+    del simulator.databag(0, "db/2")["shard"]
+    owners = simulator.run(
+        "update-status",
+        lambda: charm.PeerRelation.from_endpoint("peers").shard_owners(),
+    )
+    assert set(owners) == {
+        str(item) for item in assignment["db/0"] + assignment["db/1"]
+    }
@@ -0,0 +1,182 @@
+import gc
+import threading
+import weakref
+
+import charm
+
+
+def test_hooks_in_sequence():
+    simulator = charm.Simulator(unit="db/0", config={"port": 5432})
+    relation_id = simulator.add_relation(
+        "database", remote_app="client", remote_units=["client/0"]
+    )
+    seen = []
+
+    def handler():
+        seen.append(
+            (
+                type(charm.event),
+                charm.is_leader,
+                charm.config["port"],
+                (
+                    dict(charm.event.relation.other_app)
+                    if isinstance(charm.event, charm.RelationEvent)
+                    else None
+                ),
+            )
+        )
+
+    simulator.run("install", handler)
+    simulator.leader = True
+    simulator.run("leader-elected", handler)
+    simulator.config["port"] = 6432
+    simulator.run("config-changed", handler)
+    simulator.databag(relation_id, "client")["database"] = "foo"
+    simulator.run(
+        "database-relation-changed",
+        handler,
+        relation_id=relation_id,
+        remote_unit="client/0",
+    )
+    assert seen == [
+        (charm.InstallEvent, False, 5432, None),
+        (charm.LeaderElectedEvent, True, 5432, None),
+        (charm.ConfigChangedEvent, True, 6432, None),
+        (charm.RelationChangedEvent, True, 6432, {"database": "foo"}),
+    ]
+
+
+def test_writes_are_visible_to_next_hook():
+    simulator = charm.Simulator(unit="db/0", leader=True)
+    relation_id = simulator.add_relation(
+        "database", remote_app="client", remote_units=["client/0"]
+    )
+
+    def write():
+        relation = charm.Endpoint("database").relation
+        relation.my_app["endpoints"] = "db-0:5432"
+        relation.my_unit["address"] = "db-0"
+        charm.unit_status = charm.ActiveStatus()
+
+    def read():
+        relation = charm.Endpoint("database").relation
+        return dict(relation.my_app), relation.my_unit["address"], charm.unit_status
+
+    simulator.run("database-relation-joined", write, relation_id=relation_id)
+    assert simulator.databag(relation_id, "db") == {"endpoints": "db-0:5432"}
+    app_databag, address, status = simulator.run("update-status", read)
+    assert app_databag == {"endpoints": "db-0:5432"}
+    assert address == "db-0"
+    assert status == charm.ActiveStatus()
+
+    simulator.remove_relation(relation_id)
+    assert simulator.run("update-status", lambda: len(charm.Endpoint("database"))) == 0
+
+
+def test_event_is_cached_per_hook():
+    simulator = charm.Simulator(unit="db/0")
+
+    def handler():
+        assert charm.event is charm.event
+        return charm.event
+
+    first = simulator.run("install", handler)
+    second = simulator.run("install", handler)
+    assert first is not second
+
+
+def test_simulators_in_threads_are_independent():
+    simulators = [charm.Simulator(unit=f"app{index}/0") for index in range(4)]
+    barrier = threading.Barrier(len(simulators))
+    results = {}
+
+    def handler():
+        # All simulators are inside `run()` at the same time
+        barrier.wait()
+        return [charm.unit for _ in range(100)]
+
+    def run(simulator):
+        results[simulator.unit] = simulator.run("update-status", handler)
+
+    threads = [
+        threading.Thread(target=run, args=(simulator,)) for simulator in simulators
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for simulator in simulators:
+        assert {str(unit) for unit in results[simulator.unit]} == {simulator.unit}
+
+
+def test_thread_pool_uses_bound_context():
+    simulator = charm.Simulator(unit="db/0", leader=True)
+    relation_ids = [
+        simulator.add_relation("database", remote_app=f"client{index}")
+        for index in range(10)
+    ]
+    failures = simulator.run(
+        "update-status",
+        lambda: charm.Endpoint("database").broadcast({"foo": "bar"}, max_workers=4),
+    )
+    assert failures == {}
+    for relation_id in relation_ids:
+        assert simulator.databag(relation_id, "db/0") == {"foo": "bar"}
+
+
+def test_action():
+    simulator = charm.Simulator(unit="db/0")
+
+    def handler():
+        event = charm.event
+        event.log(f"Backing up to {event.parameters['path']}")
+        event.result = {"size": "42"}
+
+    simulator.run_action("backup", handler, parameters={"path": "/tmp"})
+    assert simulator.action_logs == ["Backing up to /tmp"]
+    assert simulator.action_results == {"size": "42"}
+    assert simulator.action_failure is None
+
+
+def test_event_is_cached_per_hook_in_threads():
+    simulators = [charm.Simulator(unit=f"app{index}/0") for index in range(4)]
+    relation_ids = [
+        simulator.add_relation("database", remote_app="client")
+        for simulator in simulators
+    ]
+    barrier = threading.Barrier(len(simulators))
+    results = {}
+
+    def handler():
+        event = charm.event
+        relation = event.relation
+        cached = True
+        for _ in range(10):
+            # Other simulators access `charm.event` between accesses
+            barrier.wait(timeout=10)
+            cached &= charm.event is event and charm.event.relation is relation
+        return cached
+
+    def run(simulator, relation_id):
+        results[simulator.unit] = simulator.run(
+            "database-relation-changed", handler, relation_id=relation_id
+        )
+
+    threads = [
+        threading.Thread(target=run, args=arguments)
+        for arguments in zip(simulators, relation_ids)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {simulator.unit: True for simulator in simulators}
+
+
+def test_simulator_is_not_kept_alive():
+    simulator = charm.Simulator(unit="db/0")
+    simulator.run("install", lambda: (charm.event, charm.unit))
+    reference = weakref.ref(simulator)
+    del simulator
+    gc.collect()
+    assert reference() is None
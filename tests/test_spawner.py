@@ -0,0 +1,129 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import charm
+from charm import _context, _spawner
+
+pytestmark = pytest.mark.skipif(
+    sys.platform != "linux", reason="Spawner only supported on Linux"
+)
+
+
+@pytest.fixture
+def spawner():
+    spawner = _spawner._Spawner()
+    yield spawner
+    spawner.close()
+
+
+def test_run(spawner):
+    assert spawner.transport(["echo", "hello"], None, None) == b"hello\n"
+
+
+def test_concurrent_calls(spawner):
+    results = {}
+
+    def run(index):
+        results[index] = spawner.transport(
+            ["sh", "-c", f"sleep 0.3; echo {index}"], None, 10
+        )
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(8)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Calls run at the same time (not one after another)
+    assert time.monotonic() - start < 1.5
+    assert results == {index: f"{index}\n".encode() for index in range(8)}
+
+
+def test_stdin(spawner):
+    assert spawner.transport(["cat"], b"hello", None) == b"hello"
+    # Larger than pipe buffer
+    data = os.urandom(1024 * 1024)
+    assert spawner.transport(["cat"], data, None) == data
+    # Hook tool that does not read stdin
+    assert spawner.transport(["true"], data, None) == b""
+
+
+def test_non_zero_exit(spawner):
+    with pytest.raises(subprocess.CalledProcessError) as exception_info:
+        spawner.transport(["sh", "-c", "echo output; exit 3"], None, None)
+    assert exception_info.value.returncode == 3
+    assert exception_info.value.output == b"output\n"
+
+
+def test_killed_by_signal(spawner):
+    with pytest.raises(subprocess.CalledProcessError) as exception_info:
+        spawner.transport(["sh", "-c", "kill -TERM $$"], None, None)
+    # Like `subprocess`
+    assert exception_info.value.returncode == -signal.SIGTERM
+
+
+def test_missing_tool(spawner):
+    with pytest.raises(FileNotFoundError):
+        spawner.transport(["does-not-exist"], None, None)
+    # Helper process still works
+    assert spawner.transport(["echo", "hello"], None, None) == b"hello\n"
+
+
+def test_deadline_kills_hook_tool(spawner):
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        spawner.transport(["sleep", "10"], None, 0.2)
+    assert time.monotonic() - start < 2
+    context = _context.HookContext(
+        {}, transport=spawner.transport, deadline=time.monotonic() + 0.2
+    )
+    with _context.bind(context):
+        with pytest.raises(charm.DeadlineExceeded):
+            _context.run(["sleep", "10"])
+
+
+def test_deadline_without_pidfd(monkeypatch):
+    # Python < 3.9 or Linux < 5.3
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    spawner = _spawner._Spawner()
+    try:
+        assert spawner.transport(["echo", "hello"], None, 10) == b"hello\n"
+        with pytest.raises(subprocess.CalledProcessError):
+            spawner.transport(["false"], None, 10)
+        with pytest.raises(subprocess.TimeoutExpired):
+            spawner.transport(["sleep", "10"], None, 0.2)
+    finally:
+        spawner.close()
+
+
+def test_fallback_after_helper_exits(spawner):
+    os.kill(spawner._pid, signal.SIGKILL)
+    for _ in range(100):
+        if not spawner.alive:
+            break
+        time.sleep(0.01)
+    assert not spawner.alive
+    assert spawner.transport(["echo", "hello"], None, None) == b"hello\n"
+    with pytest.raises(subprocess.CalledProcessError):
+        spawner.transport(["false"], None, None)
+
+
+def test_import_does_not_import_rest_of_package():
+    code = (
+        "import sys\n"
+        "from charm import set_up_spawner\n"
+        "print(sorted(name for name in sys.modules if name.startswith('charm')))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(charm.__file__)),
+    ).stdout
+    assert output == b"['charm', 'charm._context', 'charm._spawner']\n"